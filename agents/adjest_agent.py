@@ -1,12 +1,14 @@
 import json
+import logging
 import os
 import re
+from collections import deque
 from agents.base_agent import BaseAgent
 from tools.format import extract_code
 from tools.logger import setup_logger
 
-# 获取 logger 实例
-logger = setup_logger("AdjestAgent", log_dir="./logs")
+# 模块级函数的默认 logger (导入时不配置 handler); AdjestAgent 实例使用玩家的 logger
+_default_logger = logging.getLogger("AdjestAgent")
 
 # --- 1. 第一阶段: 基础分类 (Plan -> Task Type) ---
 
@@ -61,7 +63,7 @@ Example Output 3:
 """
     return prompt
 
-def extract_json_list(text: str) -> list | None:
+def extract_json_list(text: str, logger: logging.Logger = _default_logger) -> list | None:
     """
     从 LLM 的原始文本输出中提取 JSON 列表。
     优先使用 extract_code (来自 tools.format)，然后回退到 regex。
@@ -141,7 +143,7 @@ Command: "{command}"
 Your Output:
 """
 
-def extract_attack_json_obj(text: str) -> dict | list | None:
+def extract_attack_json_obj(text: str, logger: logging.Logger = _default_logger) -> dict | list | None:
     """
     从 LLM 的原始文本输出中提取 JSON 对象或列表。
     这是为第二阶段（攻击分类）定制的。
@@ -176,7 +178,7 @@ def extract_attack_json_obj(text: str) -> dict | list | None:
 
 # --- 3. JSON 日志保存 ---
 
-def save_json(data: any, file_path: str):
+def save_json(data: any, file_path: str, logger: logging.Logger = _default_logger):
     """
     将数据以 JSON 格式保存到文件，并确保目录存在。
     """
@@ -187,43 +189,94 @@ def save_json(data: any, file_path: str):
     except Exception as e:
         logger.error(f"Error saving to {file_path}: {e}")
 
+def append_jsonl(record: dict, file_path: str, logger: logging.Logger = _default_logger):
+    """
+    追加一行 JSON 到 JSONL 文件 (只写本轮新增内容, 不重写历史)。
+    """
+    try:
+        with open(file_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except Exception as e:
+        logger.error(f"Error appending to {file_path}: {e}")
+
+# 分类流: 流名 -> 每轮一行 {"step": n, "items": [...]}
+CLASSIFICATION_STREAMS = ["attack_tasks_raw", "standard_attack_commands", "empty_tasks", "other_tasks"]
+
+def read_classification_stream(log_dir: str, stream: str) -> list:
+    """
+    读取一个分类流的全部条目 (按写入顺序展开)。忽略写到一半的最后一行。
+    """
+    items = []
+    file_path = os.path.join(log_dir, f"{stream}.jsonl")
+    if not os.path.isfile(file_path):
+        return items
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                items.extend(json.loads(line)["items"])
+            except (json.JSONDecodeError, KeyError):
+                continue
+    return items
+
+def compact_classification_logs(log_dirs: list[str], output_dir: str) -> dict:
+    """
+    离线合并: 把一个或多个游戏目录的 JSONL 分类流合并为旧格式的累积 JSON 文件
+    (attack_tasks_raw.json 等), 返回每个流的条目数。
+    """
+    counts = {}
+    for stream in CLASSIFICATION_STREAMS:
+        items = []
+        for log_dir in log_dirs:
+            items.extend(read_classification_stream(log_dir, stream))
+        save_json(items, os.path.join(output_dir, f"{stream}.json"))
+        counts[stream] = len(items)
+    return counts
+
 # --- 4. AdjestAgent 类 ---
 
 class AdjestAgent(BaseAgent):
-    def __init__(self, log_dir: str = "./logs/classification_logs", *args, **kwargs):
+    def __init__(
+        self,
+        log_dir: str = "./logs/classification_logs",
+        *args,
+        tail_size: int = 100,
+        logger: logging.Logger = None,
+        logging_profile: str = "sync",
+        **kwargs,
+    ):
         """
         初始化 AdjestAgent。
+        logger: 复用玩家的 logger (同一 profile, 同一游戏目录); 未给出时按 logging_profile 在 log_dir 下创建。
         """
         super().__init__(*args, **kwargs)
         self.log_dir = log_dir
+        self.logger = logger if logger is not None else setup_logger("AdjestAgent", log_dir=log_dir, profile=logging_profile)
         os.makedirs(self.log_dir, exist_ok=True)
         
-        # [修改] 实例属性，用于累积所有分类
-        self.total_attack_tasks_raw = []
-        self.total_standard_attack_commands = []
-        self.total_empty_tasks = []
-        self.total_other_tasks = []
+        # 内存中只保留最近 tail_size 条分类结果, 完整记录在 {stream}.jsonl 中
+        self.total_attack_tasks_raw = deque(maxlen=tail_size)
+        self.total_standard_attack_commands = deque(maxlen=tail_size)
+        self.total_empty_tasks = deque(maxlen=tail_size)
+        self.total_other_tasks = deque(maxlen=tail_size)
+        self.total_counts = {stream: 0 for stream in CLASSIFICATION_STREAMS}
+        self.run_count = 0
         
-        logger.info(f"AdjestAgent initialized. Classification logs will be saved to {self.log_dir}")
+        self.logger.info(f"AdjestAgent initialized. Classification logs will be saved to {self.log_dir}")
 
-    def save_json_logs(self):
+    def save_json_logs(self, current: dict):
         """
-        [修改] 将 [所有累积] 的分类结果保存到 JSON 文件中。
-        (不再需要参数)
+        将 [本轮] 的分类结果追加到各自的 JSONL 流 (每轮每个流一行)。
+        用 compact_classification_logs 合并为完整的 JSON 文件。
         """
         try:
-            # 保存第一阶段识别出的所有 Attack Task 字符串
-            save_json(self.total_attack_tasks_raw, os.path.join(self.log_dir, "attack_tasks_raw.json"))
-            # 保存第二阶段解析出的 Standard Attack (JSON 对象)
-            save_json(self.total_standard_attack_commands, os.path.join(self.log_dir, "standard_attack_commands.json"))
-            # 保存 Empty Task
-            save_json(self.total_empty_tasks, os.path.join(self.log_dir, "empty_tasks.json"))
-            # 保存 Other Task (现在也包括了特殊技能)
-            save_json(self.total_other_tasks, os.path.join(self.log_dir, "other_tasks.json"))
+            for stream in CLASSIFICATION_STREAMS:
+                record = {"step": self.run_count, "items": current[stream]}
+                append_jsonl(record, os.path.join(self.log_dir, f"{stream}.jsonl"), self.logger)
+                self.total_counts[stream] += len(current[stream])
             
-            logger.info(f"Cumulative classification logs saved to {self.log_dir}")
+            self.logger.info(f"Classification logs of run {self.run_count} appended to {self.log_dir}")
         except Exception as e:
-            logger.error(f"Failed to save cumulative classification logs: {e}")
+            self.logger.error(f"Failed to append classification logs: {e}")
 
     def classify_plan(self, plan: str):
         """
@@ -238,14 +291,14 @@ class AdjestAgent(BaseAgent):
                 need_json=True 
             )
             
-            categories_list = extract_json_list(response)
+            categories_list = extract_json_list(response, self.logger)
             
             category = None
             
             if categories_list and isinstance(categories_list, list) and len(categories_list) == 1:
                 category = str(categories_list[0]).strip()
             else:
-                logger.error(f"Expected JSON list with 1 element, but got: {categories_list}. Raw: '{response}'")
+                self.logger.error(f"Expected JSON list with 1 element, but got: {categories_list}. Raw: '{response}'")
 
             if category == "Attack Task":
                 return "Attack Task"
@@ -255,13 +308,13 @@ class AdjestAgent(BaseAgent):
                 return "Other Task"
             else:
                 if category is not None:
-                    logger.warning(f"Unknown category '{category}' for plan: '{plan}'. Defaulting to 'Other Task'.")
+                    self.logger.warning(f"Unknown category '{category}' for plan: '{plan}'. Defaulting to 'Other Task'.")
                 else:
-                    logger.warning(f"Parse failed for plan: '{plan}'. Defaulting to 'Other Task'.")
+                    self.logger.warning(f"Parse failed for plan: '{plan}'. Defaulting to 'Other Task'.")
                 return "Other Task"
 
         except Exception as e:
-            logger.error(f"Error during LLM call or classification for plan '{plan}': {e}")
+            self.logger.error(f"Error during LLM call or classification for plan '{plan}': {e}")
             return "Other Task"
 
     def classify_attack_detail(self, plan: str):
@@ -279,12 +332,12 @@ class AdjestAgent(BaseAgent):
             )
             
             # 使用为第二阶段定制的解析器
-            parsed_output = extract_attack_json_obj(response)
+            parsed_output = extract_attack_json_obj(response, self.logger)
             
             return parsed_output # 可能是 dict, list, 或 None
 
         except Exception as e:
-            logger.error(f"Error during LLM call for attack detail classification '{plan}': {e}")
+            self.logger.error(f"Error during LLM call for attack detail classification '{plan}': {e}")
             return None # 失败时返回 None
 
     def run(self, plans: list[str]):
@@ -298,7 +351,7 @@ class AdjestAgent(BaseAgent):
             dict: [本轮] 分类后规划的字典。
                   e.g., {"standard_attack_commands": [{}], "empty_tasks": [], "other_tasks": []}
         """
-        logger.info(f"Starting 2-stage classification for {len(plans)} plans...")
+        self.logger.info(f"Starting 2-stage classification for {len(plans)} plans...")
         
         # 1. 为 [本轮] 初始化临时列表
         # 阶段1：基础分类
@@ -311,7 +364,7 @@ class AdjestAgent(BaseAgent):
 
         for plan in plans:
             if not isinstance(plan, str) or not plan.strip():
-                logger.warning(f"Skipping empty or invalid plan: {plan}")
+                self.logger.warning(f"Skipping empty or invalid plan: {plan}")
                 continue
             
             # --- 阶段 1 ---
@@ -338,14 +391,20 @@ class AdjestAgent(BaseAgent):
                     # 按要求归类到 'Other Task'
                     current_other_tasks.append(plan)
 
-        # 3. 将 [本轮] 结果累积到 [总] 实例属性中
+        # 3. 将 [本轮] 结果累积到 [总] 实例属性中 (有界的最近记录)
         self.total_attack_tasks_raw.extend(current_attack_tasks_raw)
         self.total_standard_attack_commands.extend(current_standard_attack_commands)
         self.total_empty_tasks.extend(current_empty_tasks)
         self.total_other_tasks.extend(current_other_tasks)
 
-        # 4. 保存 [总] 日志
-        self.save_json_logs() # (不需要参数)
+        # 4. 追加 [本轮] 日志
+        self.save_json_logs({
+            "attack_tasks_raw": current_attack_tasks_raw,
+            "standard_attack_commands": current_standard_attack_commands,
+            "empty_tasks": current_empty_tasks,
+            "other_tasks": current_other_tasks,
+        })
+        self.run_count += 1
 
         # 5. 返回 [本轮] 结果
         result = {
@@ -354,7 +413,7 @@ class AdjestAgent(BaseAgent):
             "other_tasks": current_other_tasks
         }
         
-        logger.info(f"Classification complete [Current Run]. Standard Attacks: {len(current_standard_attack_commands)}, Empty: {len(current_empty_tasks)}, Other/Special: {len(current_other_tasks)}.")
-        logger.info(f"Classification complete [Total]. Standard Attacks: {len(self.total_standard_attack_commands)}, Empty: {len(self.total_empty_tasks)}, Other/Special: {len(self.total_other_tasks)}.")
+        self.logger.info(f"Classification complete [Current Run]. Standard Attacks: {len(current_standard_attack_commands)}, Empty: {len(current_empty_tasks)}, Other/Special: {len(current_other_tasks)}.")
+        self.logger.info(f"Classification complete [Total]. Standard Attacks: {self.total_counts['standard_attack_commands']}, Empty: {self.total_counts['empty_tasks']}, Other/Special: {self.total_counts['other_tasks']}.")
         
         return result
\ No newline at end of file
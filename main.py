@@ -10,6 +10,8 @@ import os
 from players import LLMPlayer
 from tools import constants
 from tools.llm import LLMClient
+from tools.logger import LOGGING_PROFILES, stop_logging
+from tools.retention import apply_retention
 
 load_dotenv()
 
@@ -114,6 +116,41 @@ def parse_args():
         action="store_true",
         help="Enable this to improve the data quality while collecting data. Disable this to benchmark the agent.",
     )
+    parser.add_argument(
+        "--disable_chat",
+        action="store_true",
+        help="Do not send in-game chat messages (they are still logged). Useful for benchmarking.",
+    )
+    parser.add_argument(
+        "--logging_profile",
+        choices=LOGGING_PROFILES,
+        default="sync",
+        help="async: write logs from a listener thread; quiet: async without console output, print() goes to the log file.",
+    )
+    # For log retention
+    parser.add_argument(
+        "--compress_logs",
+        action="store_true",
+        help="After the game, pack its log folder into game.tar.gz (replay and result.json stay uncompressed).",
+    )
+    parser.add_argument(
+        "--logs_quota_gb",
+        type=float,
+        default=None,
+        help="After the game, delete the oldest finished games under logs/ until it fits in this size.",
+    )
+    # For profiling
+    parser.add_argument(
+        "--enable_profiling",
+        action="store_true",
+        help="Record per-component step timings into profile.json next to trace.jsonl.",
+    )
+    parser.add_argument(
+        "--profile_slow_step_ms",
+        type=float,
+        default=None,
+        help="With --enable_profiling, sample stacks and keep them for steps slower than this (slow_steps.json).",
+    )
 
     args = parser.parse_args()
 
@@ -175,14 +212,16 @@ ai_player = LLMPlayer(
 )
 host_player = Bot(getattr(Race, args.own_race), ai_player)
 
-with open(ai_player.log_path + "/config.json", "w", encoding="utf-8") as f:
-    json.dump(vars(args), f, indent=4)
-
 import random
 
 # 生成一个随机种子
 # 2**32 - 1 是 4294967295，这是一个常用的种子范围
 random_seed_value = random.randint(0, 100)
+# 记录到 config.json 和 result.json
+args.random_seed = random_seed_value
+
+with open(ai_player.log_path + "/config.json", "w", encoding="utf-8") as f:
+    json.dump(vars(args), f, indent=4)
 
 # 将生成的种子放入您的代码中
 res = run_game(
@@ -194,4 +233,10 @@ res = run_game(
     random_seed=random_seed_value
 )
 
-# print(f"本次游戏使用的随机种子是: {random_seed_value}")
\ No newline at end of file
+# print(f"本次游戏使用的随机种子是: {random_seed_value}")
+
+if args.compress_logs or args.logs_quota_gb is not None:
+    # 先关闭日志文件 (含 sync profile 的 FileHandler), 再打包本局目录
+    stop_logging()
+    max_bytes = int(args.logs_quota_gb * 1024**3) if args.logs_quota_gb is not None else None
+    apply_retention("logs", compress=args.compress_logs, max_bytes=max_bytes, folders=[ai_player.log_path])
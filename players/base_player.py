@@ -13,8 +13,17 @@ import pandas as pd
 import random
 
 from tools.logger import setup_logger
-from tools.format import extract_code, extract_first_number
-from tools.ops import IterativeMean
+from tools.format import extract_code, extract_first_number, construct_obs_text
+from tools.ops import IterativeMean, TagIdAllocator
+from tools.profiler import StepProfiler
+from tools.trace_io import TraceWriter, TRACE_FILE
+from tools.obs_archive import ObservationArchive, ARCHIVE_FILE
+from tools.results import write_result
+from tools.metrics import MetricsSink, METRICS_FILE
+from .map_info import MapInfo
+from .placement import PlacementPlanner
+from .pathing import PathingOracle
+from .unit_arrays import UnitArrays, FrameSnapshot
 
 
 class TargetType:
@@ -74,22 +83,57 @@ class BasePlayer(BotAI):
         self.enable_logging = enable_logging
         if enable_logging:
             self.log_path = f"{log_path}/{self.real_model_name}/{time_str}"
-            os.makedirs(f"{self.log_path}/observation", exist_ok=True)
-            self.logger = setup_logger(f"{player_name}_{self.real_model_name}", log_dir=self.log_path)
-
-        self._tag_to_id = {}
-        self._id_to_tag = {}
+            os.makedirs(self.log_path, exist_ok=True)
+            self.logger = setup_logger(
+                f"{player_name}_{self.real_model_name}", log_dir=self.log_path, profile=getattr(config, "logging_profile", "sync")
+            )
+            # trace: 每个 idx 结束后追加一行到 trace.jsonl (后台线程写入), 不再整体重写 trace.json
+            self.trace_writer = TraceWriter(f"{self.log_path}/{TRACE_FILE}")
+            # 观测文本存入单个 sqlite 文件 (按 idx, key 索引), 不再每步写一个 observation/{idx}-{key}.txt
+            self.obs_archive = ObservationArchive(f"{self.log_path}/{ARCHIVE_FILE}")
+            # 每轮指标另存为列式文件 (metrics.npz), 分析时无需加载整个 trace
+            self.metrics_sink = MetricsSink(f"{self.log_path}/{METRICS_FILE}")
+
+        # id 的回收以 step 为周期: 释放后保留 TAG_HOLD_STEPS 步再复用;
+        # 每 TAG_SWEEP_INTERVAL 步检查一次, 连续 TAG_SWEEP_MISSES 次不在场上的 tag (视野外死亡的敌人、被替换的快照资源) 被释放
+        self.TAG_HOLD_STEPS = 200
+        self.TAG_SWEEP_INTERVAL = 100
+        self.TAG_SWEEP_MISSES = 3
+        self.id_allocator = TagIdAllocator(hold_cycles=self.TAG_HOLD_STEPS)
         self._id_to_abilities = {}
-        self.next_id = 1
 
+        # 只保留最近的动作与 trace 步骤, 更早的 trace 步骤已写入 trace.jsonl, 从内存中移除
+        self.ACTION_HISTORY_LENGTH = 10
+        self.TRACE_WINDOW = 32
         self.last_action = []
         self.trace = {}
+        self._trace_idx = None
+        self._trace_dirty = False
         self.tag_to_health = {}
 
         self.sbr = IterativeMean()
         self.resource_cost = 0
+        self.decision_count = 0
+        self._start_wall_time = time.time()
 
         self.miner_units = ["SCV", "Probe", "Drone"]
+        self.map_info = None
+        self.placement_planner = None
+        self.pathing = None
+        self._snapshot = None
+
+        # chat: 每步的消息合并为一条, 至少间隔 CHAT_MIN_INTERVAL 个 game loop 发送一次
+        self.chat_enabled = not getattr(config, "disable_chat", False)
+        self.CHAT_MIN_INTERVAL = 22
+        self.CHAT_MAX_LENGTH = 250
+        self._chat_buffer = {False: [], True: []}  # team_only -> messages
+        self._last_chat_loop = -self.CHAT_MIN_INTERVAL
+
+        slow_step_ms = getattr(config, "profile_slow_step_ms", None)
+        self.profiler = StepProfiler(
+            enabled=getattr(config, "enable_profiling", False) and enable_logging,
+            slow_step_threshold=slow_step_ms / 1000 if slow_step_ms else None,
+        )
 
     def logging(self, key: str, value, level="info", save_trace=False, save_file=False, print_log=True):
         if not self.enable_logging:
@@ -105,18 +149,46 @@ class BasePlayer(BotAI):
                 self.logger.error(text)
 
         if save_trace:
-            if idx not in self.trace:
-                self.trace[idx] = {}
-            self.trace[idx][key] = value
-            if idx % 500 == 0:
-                with open(f"{self.log_path}/trace.json", "w", encoding="utf-8") as f:
-                    json.dump(self.trace, f, indent=2, ensure_ascii=False)
+            self._trace_step(idx)[key] = value
 
         if save_file:
-            with open(f"{self.log_path}/observation/{idx}-{key}.txt", "w", encoding="utf-8") as f:
-                if isinstance(value, list) or isinstance(value, dict):
-                    value = json.dumps(value, indent=2, ensure_ascii=False)
-                f.write(value)
+            if isinstance(value, list) or isinstance(value, dict):
+                value = json.dumps(value, indent=2, ensure_ascii=False)
+            self.obs_archive.put(idx, key, value)
+
+    def logging_record(self, key: str, record: dict, print_log=True):
+        """Log several metrics as one line and merge them into the trace step in one update."""
+        if not self.enable_logging:
+            return
+        idx = self.state.game_loop // 4
+        if print_log:
+            self.logger.info(f"({idx}) {key}: {json.dumps(record, ensure_ascii=False)}")
+        self._trace_step(idx).update(record)
+
+    def _trace_step(self, idx: int) -> dict:
+        """The trace record of ``idx``; the previous step is handed to the trace writer once a new one starts."""
+        if idx != self._trace_idx:
+            self._write_trace_step()
+            self._trace_idx = idx
+        if idx not in self.trace:
+            self.trace[idx] = {}
+        self._trace_dirty = True
+        return self.trace[idx]
+
+    def _write_trace_step(self):
+        if self._trace_dirty and self._trace_idx in self.trace:
+            self.trace_writer.write(self._trace_idx, self.trace[self._trace_idx])
+        self._trace_dirty = False
+        # every step but the current one is on the writer's queue / on disk, so old ones can be dropped
+        while len(self.trace) > self.TRACE_WINDOW:
+            del self.trace[next(iter(self.trace))]
+
+    def checkpoint_trace(self):
+        """Write the current step now and make the trace durable up to here (called after each decision)."""
+        if not self.enable_logging:
+            return
+        self._write_trace_step()
+        self.trace_writer.checkpoint()
 
     async def on_end(self, game_result):
         game_result = game_result.name
@@ -128,8 +200,61 @@ class BasePlayer(BotAI):
         self.logging("time_cost", time_cost, save_trace=True)
         self.logging("RUR", round(self.resource_cost / time_cost, 4), save_trace=True)
 
-        with open(f"{self.log_path}/trace.json", "w", encoding="utf-8") as f:
-            json.dump(self.trace, f, indent=2, ensure_ascii=False)
+        if self.enable_logging:
+            self._write_trace_step()
+            self.trace_writer.close({"game_result": game_result})
+            self.obs_archive.close()
+            self.metrics_sink.close()
+            write_result(self.log_path, self.result_record(game_result, time_cost))
+        self.profiler.dump(self.log_path)
+
+    def result_record(self, game_result: str, time_cost: int) -> dict:
+        """Summary of the finished game written to result.json (read by the summary / ELO scripts)."""
+        stats = getattr(self.llm_client, "stats", {})
+        return {
+            "result": game_result,
+            "game_seconds": time_cost,
+            "wall_seconds": round(time.time() - self._start_wall_time, 1),
+            "game_loop": self.state.game_loop,
+            "own_race": self.race.name,
+            "enemy_race": self.enemy_race.name,
+            "map": getattr(self.config, "map_name", self.game_info.map_name),
+            "difficulty": getattr(self.config, "difficulty", None),
+            "ai_build": getattr(self.config, "ai_build", None),
+            "player_name": self.player_name,
+            "model": self.model_name,
+            "seed": getattr(self.config, "random_seed", None),
+            "decisions": self.decision_count,
+            "llm": dict(stats),
+            "SBR": round(self.sbr.mean, 4),
+            "RUR": round(self.resource_cost / time_cost, 4),
+        }
+
+    async def on_start(self):
+        self._start_wall_time = time.time()
+        self.map_info = MapInfo(self)
+        self.placement_planner = PlacementPlanner(self.game_info.placement_grid)
+        self.pathing = PathingOracle(self.game_info.pathing_grid)
+        self.pathing.precompute([self.start_location, *self.enemy_start_locations])
+
+    async def on_unit_destroyed(self, unit_tag: int):
+        unit = self._all_units_previous_map.get(unit_tag)
+        if unit is not None and (unit.is_mineral_field or unit.is_vespene_geyser):
+            self.map_info.remove_resource(unit.position)
+        self.release_tag(unit_tag)
+
+    async def on_enemy_unit_left_vision(self, unit_tag: int):
+        # the id is kept while the enemy is out of vision: the LLM may still
+        # refer to it, and it must not be handed to another unit meanwhile;
+        # sweep_tags releases it if the enemy stays away (e.g. died unseen)
+        pass
+
+    @property
+    def snapshot(self) -> FrameSnapshot:
+        """Numpy arrays of the current frame's units, rebuilt once per game loop."""
+        if self._snapshot is None or self._snapshot.game_loop != self.state.game_loop:
+            self._snapshot = FrameSnapshot(self)
+        return self._snapshot
 
     def update_tag_to_health(self):
         self.tag_to_health = {unit.tag: unit.health for unit in self.units}
@@ -153,13 +278,18 @@ class BasePlayer(BotAI):
         return unit_amount + structures_amount + pending_amount
 
     async def on_step(self, iteration: int):
+        self.id_allocator.next_cycle()
+        if iteration % self.TAG_SWEEP_INTERVAL == 0:
+            self.sweep_tags()
         if len(self.units) == 0 or len(self.townhalls) == 0:
             return
         self.sbr.update(int(self.supply_used == self.supply_cap))
 
         #### before run
-        await self.run(iteration)
+        with self.profiler.step(iteration):
+            await self.run(iteration)
         #### after run
+        await self.flush_chat()
 
         if iteration % 15 == 0:
             self.update_tag_to_health()
@@ -167,6 +297,27 @@ class BasePlayer(BotAI):
     async def run(self, iteration: int):
         raise NotImplementedError
 
+    async def chat_send(self, message: str, team_only: bool = False):
+        """Log the message and buffer it; ``flush_chat`` sends the buffer as one chat action."""
+        assert isinstance(message, str), f"{message} is not a string"
+        self.logging("chat", message)
+        if self.chat_enabled:
+            self._chat_buffer[team_only].append(message)
+
+    async def flush_chat(self):
+        """Send each channel's (all / team) buffered messages as one chat action."""
+        if not any(self._chat_buffer.values()) or self.state.game_loop - self._last_chat_loop < self.CHAT_MIN_INTERVAL:
+            return
+        for team_only, messages in self._chat_buffer.items():
+            if not messages:
+                continue
+            text = " | ".join(messages)
+            if len(text) > self.CHAT_MAX_LENGTH:
+                text = text[: self.CHAT_MAX_LENGTH - 3] + "..."
+            await super().chat_send(text, team_only=team_only)
+        self._chat_buffer = {False: [], True: []}
+        self._last_chat_loop = self.state.game_loop
+
     def verify_actions(self, actions):
         if isinstance(actions, str):
             try:
@@ -251,7 +402,7 @@ class BasePlayer(BotAI):
         if "target_unit" in action:
             if not isinstance(action["target_unit"], int):
                 return False, "`target_unit` must be an integer"
-            if action["target_unit"] not in self._id_to_tag:
+            if not self.id_allocator.has_id(action["target_unit"]):
                 return False, f"Unit with id {action['target_unit']} not found"
             target_unit = self.get_unit_by_id(action["target_unit"])
             if target_unit is None:
@@ -263,7 +414,7 @@ class BasePlayer(BotAI):
         for unit_id in action["units"]:
             if not isinstance(unit_id, int):
                 return False, "`units` must be a list of integers"
-            if unit_id not in self._id_to_tag:
+            if not self.id_allocator.has_id(unit_id):
                 return False, f"Unit with id {unit_id} not found"
             if unit_id not in self._id_to_abilities:
                 return False, f"Unit with id {unit_id} not found"
@@ -325,16 +476,23 @@ class BasePlayer(BotAI):
 
     ################ tag id mapping
     def tag_to_id(self, tag: int):
-        if tag not in self._tag_to_id:
-            next_id = tag % 1000
-            while next_id in self._id_to_tag:
-                next_id = (next_id + 1) % 1000
-            self._tag_to_id[tag] = next_id
-            self._id_to_tag[next_id] = tag
-        return self._tag_to_id[tag]
+        return self.id_allocator.allocate(tag)
 
     def id_to_tag(self, _id: int):
-        return self._id_to_tag[_id]
+        return self.id_allocator.id_to_tag[_id]
+
+    def release_tag(self, tag: int):
+        """Forget a dead (or long gone) unit's tag; its id is reused only after TAG_HOLD_STEPS steps."""
+        _id = self.id_allocator.release(tag)
+        if _id is not None:
+            self._id_to_abilities.pop(_id, None)
+        self.tag_to_health.pop(tag, None)
+
+    def sweep_tags(self):
+        """Release the ids of tags that have not been in the game for several sweeps."""
+        present = set(self.all_units.tags) | set(self.destructables.tags)
+        for tag in self.id_allocator.stale_tags(present, self.TAG_SWEEP_MISSES):
+            self.release_tag(tag)
 
     def get_unit_by_tag(self, tag: int):
         unit = self.all_units.find_by_tag(tag)
@@ -344,6 +502,26 @@ class BasePlayer(BotAI):
         tag = self.id_to_tag(_id)
         return self.get_unit_by_tag(tag)
 
+    async def _find_planned_placement(self, building_ability, near, max_distance, random_alternative, placement_step, addon_place):
+        """Nearest free slots from the placement planner, confirmed by one client query."""
+        if self.placement_planner is None:
+            return None
+        radius = self.game_data.abilities[building_ability.value]._proto.footprint_radius
+        if not radius:
+            return None
+        self.placement_planner.sync((*self.structures, *self.enemy_structures, *self.resources))
+        candidates = self.placement_planner.candidates(int(round(2 * radius)), near, max(max_distance, 1), addon=addon_place)
+        if not candidates:
+            return None
+        res = await self.client._query_building_placement_fast(building_ability, candidates)
+        confirmed = [p for r, p in zip(res, candidates) if r]
+        if not confirmed:
+            return None
+        if random_alternative:
+            nearest = confirmed[0].distance_to_point2(near)
+            return random.choice([p for p in confirmed if p.distance_to_point2(near) <= nearest + placement_step])
+        return confirmed[0]
+
     async def find_placement(
         self,
         building,
@@ -370,6 +548,10 @@ class BasePlayer(BotAI):
             building_ability = self.game_data.units[building.value].creation_ability.id
         else:
             building_ability = building
+        # 先用预计算的建筑位网格, 一次客户端查询确认; 失败 (如需要能量场/菌毯) 时退回螺旋搜索
+        planned = await self._find_planned_placement(building_ability, near, max_distance, random_alternative, placement_step, addon_place)
+        if planned is not None:
+            return planned
         # 【修复第一步】: 如果需要检查附加建筑，提前获取补给站的建造AbilityId
         # 这是一个标准的2x2建筑，非常适合用来检查附加建筑的空位
         addon_check_ability = None
@@ -535,27 +717,34 @@ class BasePlayer(BotAI):
 
         valid_actions = [json.dumps(action, ensure_ascii=False) for action in valid_actions]
         self.last_action.extend(valid_actions)
+        del self.last_action[: -self.ACTION_HISTORY_LENGTH]
 
     ############### run actions shy 屏蔽 all attack command
 
     ################ obs to text
     async def obs_to_text(self):
         obs = {}
-        obs["Round state"] = self.round_state_to_text()
-        obs["Own units"] = await self.units_to_text(self.units)
-        obs["Unit abilities"] = await self.abilities_to_text(self.units)
-        obs["Own structures"] = await self.structures_to_text(self.structures)
-        obs["Structure abilities"] = await self.abilities_to_text(self.structures)
-        obs["Visible enemy units"] = await self.units_to_text(self.enemy_units)
-        obs["Visible enemy structures"] = await self.structures_to_text(self.enemy_structures)
-        obs["Action history"] = self.action_history_to_text()
-        obs["Map information"] = self.miner_to_text() + "\n" + self.gas_to_text()
-        obs["Ability description"] = self.get_ability_desc(obs["Unit abilities"] + obs["Structure abilities"])
-        obs_text = "\n\n".join([f"# {key}\n{value}" for key, value in obs.items()])
-
+        section = self.profiler.section
+        with section("obs_to_text.round_state"):
+            obs["Round state"] = self.round_state_to_text()
+        with section("obs_to_text.own_units"):
+            obs["Own units"] = await self.units_to_text(self.units)
+            obs["Unit abilities"] = await self.abilities_to_text(self.units)
+        with section("obs_to_text.own_structures"):
+            obs["Own structures"] = await self.structures_to_text(self.structures)
+            obs["Structure abilities"] = await self.abilities_to_text(self.structures)
+        with section("obs_to_text.enemies"):
+            obs["Visible enemy units"] = await self.units_to_text(self.enemy_units)
+            obs["Visible enemy structures"] = await self.structures_to_text(self.enemy_structures)
+        with section("obs_to_text.map"):
+            obs["Action history"] = self.action_history_to_text()
+            obs["Map information"] = self.miner_to_text() + "\n" + self.gas_to_text()
+        with section("obs_to_text.ability_desc"):
+            obs["Ability description"] = self.get_ability_desc(obs["Unit abilities"] + obs["Structure abilities"])
+        obs_text = construct_obs_text(obs)
+
+        # 观测只存一份: trace 中的 obs 各部分与提示词共用 blob, obs_text 可由其重建 (python -m tools.obs_archive)
         self.logging("obs", obs, save_trace=True, print_log=False)
-        if self.enable_logging:
-            self.logging("obs_text", obs_text, save_file=True, print_log=False)
         return obs_text
 
     def get_ability_desc(self, text: str):
@@ -593,7 +782,7 @@ class BasePlayer(BotAI):
     def action_history_to_text(self):
         if len(self.last_action) == 0:
             return "[Empty]"
-        return "\n".join(self.last_action[-10:])
+        return "\n".join(self.last_action[-self.ACTION_HISTORY_LENGTH :])
 
     async def units_to_text(self, units: Units):
         if len(units) == 0:
@@ -603,27 +792,39 @@ class BasePlayer(BotAI):
 
         other_units = units
         if units.first.is_mine:
+            # bucket workers in a single pass: mining / attacking / other
+            mining_buckets = {mining_type: [] for mining_type in self.miner_units}
+            attacking_buckets = {mining_type: [] for mining_type in self.miner_units}
+            other_units = []
+            for unit in units:
+                name = unit.name
+                if name in mining_buckets:
+                    if unit.is_attacking:
+                        attacking_buckets[name].append(unit)
+                        continue
+                    if not (unit.is_constructing_scv or unit.is_repairing):
+                        mining_buckets[name].append(unit)
+                        continue
+                other_units.append(unit)
+
             for mining_type in self.miner_units:
-                mining_judge = lambda unit: unit.name == mining_type and not (unit.is_constructing_scv or unit.is_repairing or unit.is_attacking)
-                mining_units = units.filter(mining_judge)
+                mining_units = mining_buckets[mining_type]
                 if len(mining_units) > 0:
                     mining_ids = [self.tag_to_id(unit.tag) for unit in mining_units]
                     mining_ids = ", ".join(map(str, mining_ids))
                     mining_text = f"[{mining_ids}]{mining_type}\nState: collecting resources automatically"
                     units_text.append(mining_text)
-                other_units = [unit for unit in other_units if not mining_judge(unit)]
 
-                attacking_judge = lambda unit: unit.name == mining_type and unit.is_attacking
-                attacking_units = units.filter(attacking_judge)
+                attacking_units = attacking_buckets[mining_type]
                 if len(attacking_units) > 0:
                     attacking_ids = [self.tag_to_id(unit.tag) for unit in attacking_units]
                     attacking_ids = ", ".join(map(str, attacking_ids))
                     attacking_text = f"[{attacking_ids}]{mining_type}\nState: attacking enemies automatically"
                     units_text.append(attacking_text)
-                other_units = [unit for unit in other_units if not attacking_judge(unit)]
 
-        distance_to_start = lambda unit: int((unit.position.x - self.start_location.x) ** 2 + (unit.position.y - self.start_location.y) ** 2) // 4
-        other_units = sorted(other_units, key=lambda unit: (distance_to_start(unit), unit.name))
+        distance_to_start = UnitArrays(other_units).distances_squared(self.start_location).astype(int) // 4
+        order = sorted(range(len(other_units)), key=lambda i: (distance_to_start[i], other_units[i].name))
+        other_units = [other_units[i] for i in order]
         units_text += [await self.unit_to_text(unit) for unit in other_units]
         units_text = "\n".join(units_text)
         return units_text
@@ -770,28 +971,31 @@ class BasePlayer(BotAI):
         return "|".join(states)
 
     def miner_to_text(self):
-        center = self.start_location
         miners = []
         num_workers = len([unit for unit in self.units if unit.name in self.miner_units])
-        cloest_miners = self.mineral_field.closest_n_units(center, 100)
-        cloest_miners = [mineral for mineral in cloest_miners if mineral.mineral_contents > 0]
-        cloest_miners = cloest_miners[: 2 * num_workers]
-        for mineral in cloest_miners:
-            miners.append(f"[{self.tag_to_id(mineral.tag)}]({int(mineral.position.x)}, {int(mineral.position.y)})")
+        # only the contents change during a game, the ranking comes from map_info
+        minerals = {mineral.position: mineral for mineral in self.mineral_field}
+        for position in self.map_info.mineral_ranking:
+            if len(miners) >= 2 * num_workers:
+                break
+            mineral = minerals.get(position)
+            if mineral is None or mineral.mineral_contents <= 0:
+                continue
+            miners.append(f"[{self.tag_to_id(mineral.tag)}]{self.map_info.position_text[position]}")
         if len(miners) == 0:
             return "No mineral fields found"
         return "Closest mineral fields: " + ", ".join(miners)
 
     def gas_to_text(self):
         gases = []
-        cloest_gases = self.vespene_geyser.closest_n_units(self.start_location, 100)
-        cloest_gases = [gas for gas in cloest_gases if gas.vespene_contents > 0]
-        cloest_gases = cloest_gases[:10]
-        for gas in cloest_gases:
-            # # if there is a structure on the position, ignore it
-            # if self.structures.closer_than(0.5, gas.position):
-            #     continue
-            gases.append(f"[{self.tag_to_id(gas.tag)}]({int(gas.position.x)}, {int(gas.position.y)})")
+        geysers = {gas.position: gas for gas in self.vespene_geyser}
+        for position in self.map_info.geyser_ranking:
+            if len(gases) >= 10:
+                break
+            gas = geysers.get(position)
+            if gas is None or gas.vespene_contents <= 0:
+                continue
+            gases.append(f"[{self.tag_to_id(gas.tag)}]{self.map_info.position_text[position]}")
         if len(gases) == 0:
             return "No vespene geysers found"
         return "Closest vespene geysers: " + ", ".join(gases)
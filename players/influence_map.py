@@ -0,0 +1,137 @@
+import math
+
+from sc2.position import Point2
+
+import numpy as np
+
+
+class InfluenceMap:
+    """Per-frame force / threat grids over the map at ``cell_size`` resolution.
+
+    Units with a weapon add their DPS and HP (health + shield) to the dps / hp
+    channel of their side; every enemy unit and structure adds its HP to the
+    presence channel. All channels are blurred with a separable gaussian, so a
+    cell holds the force around it. Local force follows Lanchester's square law
+    (dps * hp of the cell), and every point query is a single array lookup.
+    """
+
+    def __init__(self, width: int, height: int, cell_size: float = 2.0, sigma: float = 1.5):
+        self.cell_size = cell_size
+        self.shape = (math.ceil(height / cell_size), math.ceil(width / cell_size))
+        radius = max(1, int(3 * sigma))
+        kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+        self.kernel = kernel / kernel.sum()
+
+        self.own_dps = np.zeros(self.shape)
+        self.own_hp = np.zeros(self.shape)
+        self.enemy_dps = np.zeros(self.shape)
+        self.enemy_hp = np.zeros(self.shape)
+        self.enemy_presence = np.zeros(self.shape)
+
+    @classmethod
+    def from_bot(cls, bot, **kwargs):
+        size = bot.game_info.map_size
+        influence = cls(size.width, size.height, **kwargs)
+        influence.add_units(bot.units, own=True)
+        influence.add_units(bot.structures, own=True)
+        influence.add_units(bot.enemy_units, own=False)
+        influence.add_units(bot.enemy_structures, own=False)
+        influence.blur()
+        return influence
+
+    def _cells(self, positions: np.ndarray):
+        iy = np.clip((positions[:, 1] // self.cell_size).astype(int), 0, self.shape[0] - 1)
+        ix = np.clip((positions[:, 0] // self.cell_size).astype(int), 0, self.shape[1] - 1)
+        return iy, ix
+
+    def add_units(self, units, own: bool):
+        if not units:
+            return
+        positions = np.array([u.position_tuple for u in units], dtype=float)
+        hp = np.array([u.health + u.shield for u in units], dtype=float)
+        dps = np.array([max(u.ground_dps, u.air_dps) for u in units], dtype=float)
+        iy, ix = self._cells(positions)
+        armed = dps > 0
+        dps_grid, hp_grid = (self.own_dps, self.own_hp) if own else (self.enemy_dps, self.enemy_hp)
+        np.add.at(dps_grid, (iy[armed], ix[armed]), dps[armed])
+        np.add.at(hp_grid, (iy[armed], ix[armed]), hp[armed])
+        if not own:
+            np.add.at(self.enemy_presence, (iy, ix), hp)
+
+    def _blur1d(self, grid: np.ndarray, axis: int) -> np.ndarray:
+        radius = len(self.kernel) // 2
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (radius, radius)
+        padded = np.pad(grid, pad)
+        out = np.zeros_like(grid)
+        n = grid.shape[axis]
+        for k, weight in enumerate(self.kernel):
+            out += weight * (padded[k : k + n] if axis == 0 else padded[:, k : k + n])
+        return out
+
+    def blur(self):
+        for name in ("own_dps", "own_hp", "enemy_dps", "enemy_hp", "enemy_presence"):
+            grid = getattr(self, name)
+            setattr(self, name, self._blur1d(self._blur1d(grid, 0), 1))
+
+    def cell_of(self, point):
+        iy = min(max(int(point[1] // self.cell_size), 0), self.shape[0] - 1)
+        ix = min(max(int(point[0] // self.cell_size), 0), self.shape[1] - 1)
+        return iy, ix
+
+    def point_of(self, cell) -> Point2:
+        return Point2((float((cell[1] + 0.5) * self.cell_size), float((cell[0] + 0.5) * self.cell_size)))
+
+    def own_force(self, point) -> float:
+        cell = self.cell_of(point)
+        return float(self.own_dps[cell] * self.own_hp[cell])
+
+    def enemy_force(self, point) -> float:
+        cell = self.cell_of(point)
+        return float(self.enemy_dps[cell] * self.enemy_hp[cell])
+
+    def threat(self, point) -> float:
+        """Enemy DPS reaching the cell of ``point``."""
+        return float(self.enemy_dps[self.cell_of(point)])
+
+    def force_ratio(self, point) -> float:
+        """Own / enemy local force around ``point`` (inf when no enemy force)."""
+        enemy = self.enemy_force(point)
+        if enemy <= 0:
+            return math.inf
+        return math.sqrt(self.own_force(point) / enemy)
+
+    def safest_cell(self, point, radius: float) -> Point2:
+        """Center of the least threatened cell within ``radius`` of ``point`` (closest on ties)."""
+        cy, cx = self.cell_of(point)
+        r = max(0, int(radius // self.cell_size))
+        y0, y1 = max(cy - r, 0), min(cy + r + 1, self.shape[0])
+        x0, x1 = max(cx - r, 0), min(cx + r + 1, self.shape[1])
+        window = self.enemy_dps[y0:y1, x0:x1]
+        yy, xx = np.mgrid[y0:y1, x0:x1]
+        order = np.lexsort((((yy - cy) ** 2 + (xx - cx) ** 2).ravel(), window.ravel()))
+        best = order[0]
+        return self.point_of((yy.ravel()[best], xx.ravel()[best]))
+
+    def weakest_enemy_cluster(self, min_presence: float = 1.0, near=None, radius: float = None):
+        """Center of the enemy cluster (local presence peak) with the least force, None if no enemies.
+
+        With ``near`` and ``radius`` only clusters within ``radius`` of ``near`` count.
+        """
+        presence = self.enemy_presence
+        padded = np.pad(presence, 1)
+        neighbours = np.stack(
+            [padded[1 + dy : 1 + dy + presence.shape[0], 1 + dx : 1 + dx + presence.shape[1]]
+             for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+        )
+        peaks = (presence >= neighbours.max(axis=0)) & (presence >= min_presence)
+        if near is not None and radius is not None:
+            cy, cx = self.cell_of(near)
+            yy, xx = np.ogrid[: presence.shape[0], : presence.shape[1]]
+            peaks &= (yy - cy) ** 2 + (xx - cx) ** 2 <= (radius / self.cell_size) ** 2
+        if not peaks.any():
+            return None
+        ys, xs = np.nonzero(peaks)
+        force = self.enemy_dps[ys, xs] * self.enemy_hp[ys, xs]
+        best = np.lexsort((-presence[ys, xs], force))[0]
+        return self.point_of((ys[best], xs[best]))
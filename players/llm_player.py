@@ -1,4 +1,9 @@
 from .base_player import BasePlayer
+from .unit_arrays import UnitArrays, PointIndex
+from .spatial_hash import SpatialHash
+from .scouting import ScoutingPlanner
+from .worker_engine import SaturationEngine
+from tools.scheduler import ManagerScheduler
 from sc2.unit import Unit
 from sc2.units import Units
 from agents import PlanAgent, ActionAgent, RagAgent, SingleAgent, AdjestAgent
@@ -9,9 +14,10 @@ from sc2.ids.ability_id import AbilityId
 from sc2.position import Point2
 from typing import Dict, Any, Set, List
 
-import random
 import random
 import math
+import numpy as np
+from collections import Counter
 
 
 class LLMPlayer(BasePlayer):
@@ -31,7 +37,7 @@ class LLMPlayer(BasePlayer):
             self.action_agent = ActionAgent(config.own_race, **agent_config)
             # [!! 在这里添加 !!]
             # 默认初始化 AdjestAgent，它将使用相同的 agent_config
-            self.adjest_agent = AdjestAgent(log_dir=self.log_path, **agent_config)
+            self.adjest_agent = AdjestAgent(log_dir=self.log_path, logger=self.logger, **agent_config)
         else:
             self.agent = SingleAgent(config.own_race, **agent_config)
 
@@ -53,22 +59,34 @@ class LLMPlayer(BasePlayer):
         self.scouted_locations = set()      # 已经侦察过的目标地点 (Point2)
         self.scv_scout_sent = False         # 确保只在游戏初期派遣一次 SCV
         self.scout_target_location = None   # 当前侦察兵的目标地点
+        self.scouting_planner = None        # 开局规划的侦察路线 (on_start)
         self.known_enemy_tags_in_vision = set() # 追踪当前在视野中的敌人, 以便检测新敌人
         
         self.structure_rally_points = {} # 记录每个生产建筑的集结点 {structure_tag: target_point}
+        self.RALLY_SAFE_RADIUS = 8  # 集结点受威胁时, 在此半径内选择威胁最小的位置
+        self.STRIKE_CLUSTER_RADIUS = 12  # 袭击位置目标时, 在此半径内选择兵力最弱的敌方集群
 
         # 驻防逻辑变量
         self.GARRISON_PERPENDICULAR_DISTANCE = 15  # 驻防点P3/P4：与基地连线的垂直距离
         self.GARRISON_EXTENSION_DISTANCE = 10      # 驻防点P2：从主集结点P1向基地延伸的距离
         self.GARRISON_CHECK_RADIUS = 4            # 驻防点检查半径：判断单位是否“在点上”的范围
         self.GARRISON_DEFENSE_ZONE_RADIUS = 30    # 驻防防区半径：从此半径内调配空闲单位
-        self.last_garrison_check_time = -1        # 上次执行驻防逻辑的游戏帧数（iteration）
+        self.GARRISON_CHECK_INTERVAL = 224        # 每 224 帧（约10秒 @ 22.4 帧/秒）检查一次驻防
 
         # 【总攻系统】用于追踪所有已发起的“总攻”编队
         # 结构: { wave_id: {"unit_tags": {tag1, tag2, ...}, "target_tag": int} }
         self.total_attack_groups: Dict[int, Dict[str, Any]] = {}
         # 用于生成唯一总攻ID的计数器
         self.total_attack_wave_id_counter: int = 0
+        # 事件驱动的编队维护: 单位 -> 编队, 目标 -> 编队, 待处理的编队, 可见敌方建筑的 KD-tree 索引
+        self.unit_to_wave: Dict[int, int] = {}
+        self.attack_target_to_waves: Dict[int, Set[int]] = {}
+        self.dirty_attack_waves: Set[int] = set()
+        self.enemy_structure_index = PointIndex()
+
+        # 我方建筑的空间网格, 仅在建筑变化 (新建/摧毁/升空降落) 时重建
+        self.structure_grid = SpatialHash(cell_size=8.0)
+        self.structure_grid_dirty = True
 
         # 定义敌方基地建筑类型
         self.enemy_townhall_types = {
@@ -83,6 +101,57 @@ class LLMPlayer(BasePlayer):
 
         self.flag_test = True
 
+        # 单位类型 -> (minerals, vespene), 整局游戏内不变
+        self.unit_value_table = {}
+
+        # 工人饱和度分配 (worker -> 矿点/气矿)
+        self.saturation_engine = SaturationEngine()
+
+        # 各 manager 的调度: 周期 (iteration), 优先级, 每次预留的时间 (秒)
+        self.scheduler = ManagerScheduler(step_budget=0.02, profiler=self.profiler)
+        self.scheduler.register("distribute_workers", self.distribute_workers, period=2, priority=2)
+        if self.config.own_race == "Terran":
+            # 敌人靠近基地时, 防御每帧都运行
+            self.scheduler.register("automatic_defense", self.automatic_defense, period=4, priority=3, urgent=self.enemies_near_base)
+            self.scheduler.register("manage_attack", self.manage_attack, period=2, priority=2)
+            self.scheduler.register("set_terran_combat_rally_points", self.set_terran_combat_rally_points, period=8, priority=1)
+            self.scheduler.register("manage_scouting", self.manage_scouting, period=8, priority=0)
+            self.scheduler.register("manage_garrison", self.manage_garrison, period=self.GARRISON_CHECK_INTERVAL, priority=1, budget=0.01)
+
+    async def on_start(self):
+        await super().on_start()
+        self.map_info.precompute_bases(self.GARRISON_EXTENSION_DISTANCE, self.GARRISON_PERPENDICULAR_DISTANCE)
+        # 侦察路线: 敌方出生点 -> 其余矿区 (地面路径距离, 最近邻 + 2-opt), 不含我方主基地
+        first = self.enemy_start_locations[0] if self.enemy_start_locations else self.game_info.map_center
+        self.scouting_planner = ScoutingPlanner(
+            first, [p for p in self.map_info.expansions_by_distance if p != self.start_location], pathing=self.pathing
+        )
+
+    async def on_end(self, game_result):
+        self.logging("scheduler_report", self.scheduler.report(), save_trace=True)
+        await super().on_end(game_result)
+
+    def enemies_near_base(self, radius: float = 20.0) -> bool:
+        """是否有敌方单位进入我方任一建筑 radius 范围内 (防御的紧急条件)"""
+        if not self.enemy_units or not self.structures:
+            return False
+        grid = self.get_structure_grid()
+        return any(grid.any_within(e.position_tuple, radius) for e in self.enemy_units)
+
+    def get_structure_grid(self) -> SpatialHash:
+        if self.structure_grid_dirty or len(self.structure_grid) != len(self.structures):
+            self.structure_grid.build(self.structures)
+            self.structure_grid_dirty = False
+        return self.structure_grid
+
+    async def on_building_construction_started(self, unit: Unit):
+        self.structure_grid_dirty = True
+
+    async def on_unit_type_changed(self, unit: Unit, previous_type: UnitTypeId):
+        # 升空 / 降落 / 升级都会改变建筑的类型 (以及可能的位置)
+        if unit.is_structure:
+            self.structure_grid_dirty = True
+
     async def distribute_workers(self, resource_ratio: float = 2.0) -> None:
         """
         根据全局矿气比分配工人，优先将工人派往采集gas。
@@ -110,153 +179,10 @@ class LLMPlayer(BasePlayer):
 
 
 
-# 3. 处理gas_site超员问题，将多余的worker释放出来加入可用工人池
-        available_idle_workers = list(active_workers.idle)
-        
-        # [修改] 遍历所有气矿 (gas_refineries)，而不是所有工人
-        for gas_site in gas_refineries:
-            if gas_site.surplus_harvesters > 0:
-                # 找到正在采集这个gas_site的工人
-                gas_workers = []
-                # [修改] 使用 'w' 作为内部循环变量名, 避免混淆
-                for w in self.workers.gathering: 
-                    # 通过距离判断worker是否在采集这个gas_site
-                    if w.distance_to(gas_site) < 2:
-                        gas_workers.append(w)
-                
-                # 计算需要释放的工人数量
-                excess_count = gas_site.surplus_harvesters
-                
-                # 将多余的工人加入到可用工人池中（取前excess_count个）
-                for i in range(min(excess_count, len(gas_workers))):
-                    worker_to_reassign = gas_workers[i] # [修改] 使用新变量名
-                    available_idle_workers.append(worker_to_reassign)
-                    print(f"Marked excess worker from gas for reassignment: {gas_site}")
-
-        # 4. 统计每个点的缺工数
-        gas_tasks = {}
-        mineral_tasks = {}
-
-        # 气矿：ideal=3，surplus_harvesters<0 时表示缺工
-        for g in gas_refineries:
-            missing = max(0, -g.surplus_harvesters)
-            if missing:
-                gas_tasks[g] = missing
-
-        # 矿点：每个矿最多2个工人（不计算MULE和即将被重新分配的工人）
-        for m in mineral_patches:
-            # 统计该矿点的工人数量（不包括MULE和即将被重新分配的工人）
-            worker_count = 0
-            for worker in self.workers.gathering:
-                if (worker.distance_to(m) < 2 and 
-                    worker not in available_idle_workers):
-                    worker_count += 1
-            need = max(0, 2 - worker_count)
-            if need:
-                mineral_tasks[m] = need
-
-        # 5. 优先处理gas_sites - 从附近mineral_sites调worker + idle_workers
-        for gas_site in list(gas_tasks.keys()):
-            needed = gas_tasks[gas_site]
-            if needed <= 0:
-                continue
-            
-            # 找到这个gas_site附近正在采集mineral的workers（排除即将被重新分配的工人）
-            nearby_mineral_workers = []
-        
-            for mineral in mineral_patches:
-                # 只考虑距离gas_site较近的mineral
-                if mineral.distance_to(gas_site) < 10:  # 距离阈值可调整
-                    # 找到正在采集这个mineral的workers
-                    for worker in self.workers.gathering:
-                        # 通过距离判断worker是否在采集这个mineral，且不在重新分配列表中
-                        if (worker.distance_to(mineral) < 2 and 
-                            worker not in available_idle_workers):
-                            nearby_mineral_workers.append((worker, worker.distance_to(gas_site)))
-        
-            # 按距离gas_site的远近排序，优先调用最近的workers
-            nearby_mineral_workers.sort(key=lambda x: x[1])
-        
-            # 重新分配mineral workers到gas_site
-            reassigned = 0
-            for worker, _ in nearby_mineral_workers:
-                if reassigned >= needed:
-                    break
-                worker.gather(gas_site)
-                print(f"Reassigned worker from mineral to gas: {gas_site}")
-                reassigned += 1
-        
-            # 更新gas_site的需求
-            needed -= reassigned
-        
-            # 如果还有缺工，用idle_workers补充
-            if needed > 0 and available_idle_workers:
-                # 找到距离gas_site最近的idle_workers
-                available_idle_workers.sort(key=lambda w: w.distance_to(gas_site))
-            
-                assigned = 0
-                workers_to_remove = []
-                for worker in available_idle_workers:
-                    if assigned >= needed:
-                        break
-                    worker.gather(gas_site)
-                    print(f"Assigned idle worker to gas: {gas_site}")
-                    workers_to_remove.append(worker)
-                    assigned += 1
-            
-                # 从available_idle_workers中移除已分配的workers
-                for worker in workers_to_remove:
-                    available_idle_workers.remove(worker)
-            
-                needed -= assigned
-        
-            # 更新gas_tasks
-            gas_tasks[gas_site] = needed
-            if gas_tasks[gas_site] <= 0:
-                del gas_tasks[gas_site]
-
-        # 6. 用剩余的idle_workers填补mineral_sites
-        for worker in available_idle_workers:
-            if not mineral_tasks:
-                break
-        
-            # 选择距离最近的mineral_site
-            target = min(mineral_tasks.keys(), key=lambda s: s.distance_to(worker))
-            worker.gather(target)
-            print(f"Assigned idle worker to mineral: {target}")
-        
-            # 更新mineral_site的需求
-            mineral_tasks[target] -= 1
-            if mineral_tasks[target] <= 0:
-                del mineral_tasks[target]
-
-        # 7. 如果还有gas_site缺工且还有mineral workers可调配，进行第二轮调配
-        if gas_tasks:
-            for gas_site in list(gas_tasks.keys()):
-                needed = gas_tasks[gas_site]
-                if needed <= 0:
-                    continue
-                
-                # 扩大搜索范围，找到更远的mineral workers
-                distant_mineral_workers = []
-                for mineral in mineral_patches:
-                    if mineral.distance_to(gas_site) < 15:  # 扩大搜索范围
-                        for worker in self.workers.gathering:
-                            if (worker.distance_to(mineral) < 2 and 
-                                worker not in available_idle_workers):
-                                distant_mineral_workers.append((worker, worker.distance_to(gas_site)))
-            
-                # 按距离排序
-                distant_mineral_workers.sort(key=lambda x: x[1])
-            
-                # 重新分配
-                reassigned = 0
-                for worker, _ in distant_mineral_workers:
-                    if reassigned >= needed:
-                        break
-                    worker.gather(gas_site)
-                    print(f"Reassigned distant worker from mineral to gas: {gas_site}")
-                    reassigned += 1
+        # 3. 按 gather 指令目标统计各矿点/气矿的工人, 饱和度变化时求解最小代价分配 (气矿优先)
+        for worker, resource in self.saturation_engine.run(active_workers, mineral_patches, gas_refineries, self.state.game_loop):
+            worker.gather(resource)
+            print(f"Assigned worker to {'mineral' if resource.is_mineral_field else 'gas'}: {resource}")
 
     async def _deploy_mules(self, mineral_patches) -> None:
         """
@@ -665,39 +591,57 @@ class LLMPlayer(BasePlayer):
 
         return suggestions
 
-    def log_current_iteration(self, iteration: int):
-        print(f"================ iteration {iteration} ================")
-        self.logging("iteration", iteration, save_trace=True)
-        self.logging("time_seconds", int(self.time), save_trace=True)
-        self.logging("minerals", self.minerals, save_trace=True)
-        self.logging("vespene", self.vespene, save_trace=True)
-        
+    def get_unit_value(self, type_id: UnitTypeId):
+        """按单位类型缓存 calculate_unit_value, 返回 (minerals, vespene)。"""
+        value = self.unit_value_table.get(type_id)
+        if value is None:
+            cost = self.calculate_unit_value(type_id)
+            value = (cost.minerals, cost.vespene)
+            self.unit_value_table[type_id] = value
+        return value
+
+    def get_metrics_snapshot(self, iteration: int) -> dict:
+        """一次遍历统计单位/建筑类型数量, 生成本轮的全部指标 (键见 tools.metrics.METRIC_KEYS)。"""
+        unit_counts = Counter(unit.type_id for unit in self.units)
+        structure_counts = Counter(structure.type_id for structure in self.structures)
+
         unit_mineral_value, unit_vespene_value = 0, 0
-        for unit in self.units:
-            unit_value = self.calculate_unit_value(unit.type_id)
-            unit_mineral_value += unit_value.minerals
-            unit_vespene_value += unit_value.vespene
-        self.logging("unit_mineral_value", unit_mineral_value, save_trace=True)
-        self.logging("unit_vespene_value", unit_vespene_value, save_trace=True)
-        
+        for type_id, count in unit_counts.items():
+            minerals, vespene = self.get_unit_value(type_id)
+            unit_mineral_value += minerals * count
+            unit_vespene_value += vespene * count
+
         structure_mineral_value, structure_vespene_value = 0, 0
-        for structure in self.structures:
-            structure_value = self.calculate_unit_value(structure.type_id)
-            structure_mineral_value += structure_value.minerals
-            structure_vespene_value += structure_value.vespene
-        self.logging("structure_mineral_value", structure_mineral_value, save_trace=True)
-        self.logging("structure_vespene_value", structure_vespene_value, save_trace=True)
-        
-        self.logging("supply_army", self.supply_army, save_trace=True)
-        self.logging("supply_workers", self.supply_workers, save_trace=True)
-        self.logging("supply_left", self.supply_left, save_trace=True)
-        self.logging("n_structures", len(self.structures), save_trace=True)
-        self.logging("n_visible_enemy_units", len(self.enemy_units), save_trace=True)
-        self.logging("n_visible_enemy_structures", len(self.enemy_structures), save_trace=True)
-        unit_types = set(unit.type_id for unit in self.units)
-        structure_types = set(unit.type_id for unit in self.structures)
-        self.logging("n_unit_types", len(unit_types), save_trace=True)
-        self.logging("n_structure_types", len(structure_types), save_trace=True)
+        for type_id, count in structure_counts.items():
+            minerals, vespene = self.get_unit_value(type_id)
+            structure_mineral_value += minerals * count
+            structure_vespene_value += vespene * count
+
+        return {
+            "iteration": iteration,
+            "time_seconds": int(self.time),
+            "minerals": self.minerals,
+            "vespene": self.vespene,
+            "unit_mineral_value": unit_mineral_value,
+            "unit_vespene_value": unit_vespene_value,
+            "structure_mineral_value": structure_mineral_value,
+            "structure_vespene_value": structure_vespene_value,
+            "supply_army": self.supply_army,
+            "supply_workers": self.supply_workers,
+            "supply_left": self.supply_left,
+            "n_structures": len(self.structures),
+            "n_visible_enemy_units": len(self.enemy_units),
+            "n_visible_enemy_structures": len(self.enemy_structures),
+            "n_unit_types": len(unit_counts),
+            "n_structure_types": len(structure_counts),
+        }
+
+    def log_current_iteration(self, iteration: int):
+        print(f"================ iteration {iteration} ================")
+        snapshot = self.get_metrics_snapshot(iteration)
+        self.logging_record("metrics", snapshot)
+        if self.enable_logging:
+            self.metrics_sink.append(snapshot)
 
 #### shy ####
     def get_enemy_units_near_structures(self, distance: float=15.0):  
@@ -715,8 +659,9 @@ class LLMPlayer(BasePlayer):
             # 如果没有敌方单位,返回空集合  
             return self.enemy_units  
         
-        # 使用 in_distance_of_group 方法筛选  
-        return self.enemy_units.in_distance_of_group(self.structures, distance)
+        # 建筑空间网格: 每个敌方单位只检查周围格子里的建筑
+        grid = self.get_structure_grid()
+        return self.enemy_units.filter(lambda e: grid.any_within(e.position_tuple, distance))
     
 
     async def automatic_defense(self, base_defense_radius: float = 10.0, response_radius: float = 20.0):
@@ -745,8 +690,9 @@ class LLMPlayer(BasePlayer):
         stopped_units = 0
 
         # 遍历当前记录在案的“我方防御单位”和“其锁定的敌方单位”
+        units_by_tag = {u.tag: u for u in self.units} if self.active_defense_map else {}
         for defender_tag, enemy_tag in self.active_defense_map.items():
-            defender = self.units.find_by_tag(defender_tag)
+            defender = units_by_tag.get(defender_tag)
 
             # 检查我方防御单位是否存活
             if not defender:
@@ -783,6 +729,9 @@ class LLMPlayer(BasePlayer):
             return # 基地安全，也无需指派新单位
 
         threat_center = enemies_near_base.center
+        # 威胁处局部兵力比 (influence map) 不占优时, 从整个驻防防区调集防御单位
+        if self.snapshot.influence.force_ratio(threat_center) < 1.0:
+            response_radius = max(response_radius, self.GARRISON_DEFENSE_ZONE_RADIUS)
         # 找出在响应范围内的所有可用单位
         responding_units = available_defenders.closer_than(response_radius, threat_center)
 
@@ -793,9 +742,10 @@ class LLMPlayer(BasePlayer):
         unassigned_defenders = responding_units.filter(lambda u: u.tag not in self.active_defense_map)
 
         new_assignments = 0
+        threat_grid = SpatialHash(cell_size=8.0).build(enemies_near_base)
         for unit in unassigned_defenders:
             # 命令每个单位攻击距离它自己最近的那个威胁
-            target = enemies_near_base.closest_to(unit)
+            target = threat_grid.nearest(unit.position_tuple)
             if target:
                 unit.attack(target)
                 # [记录防御行为]
@@ -839,36 +789,38 @@ class LLMPlayer(BasePlayer):
                 # 如果一个"中心"都没有，则无法设置
                 return
 
-            # 3. 获取地图中心
-            map_center = self.game_info.map_center
-
-            # 4. 预先计算所有"集结中心"的集结点
+            # 3. 预先计算所有"集结中心"的集结点 (几何位置由 map_info 缓存)
+            # 集结点附近有敌方火力时, 改到 RALLY_SAFE_RADIUS 内威胁最小的格子 (influence map)
+            influence = self.snapshot.influence
             rally_points_by_center_tag = {}
             for center in all_ready_rally_centers:
-                rally_point = center.position.towards(map_center, 15)
-                rally_points_by_center_tag[center.tag] = rally_point
+                rally_point = self.map_info.rally_point(center.position)
+                rally_points_by_center_tag[center.tag] = influence.safest_cell(rally_point, self.RALLY_SAFE_RADIUS)
 
-            # 5. [新增] 获取当前所有相关生产建筑
+            # 4. [新增] 获取当前所有相关生产建筑
             ready_combat_structures = self.structures(combat_structures).ready
             current_combat_tags = {s.tag for s in ready_combat_structures}
             
-            # 6. [新增] 清理缓存中已不存在(被摧毁)的建筑
+            # 5. [新增] 清理缓存中已不存在(被摧毁)的建筑
             # (使用 list() 来允许在迭代时修改字典)
             tags_to_remove = [tag for tag in self.structure_rally_points if tag not in current_combat_tags]
             for tag in tags_to_remove:
                 del self.structure_rally_points[tag]
                 print(f"Rally cache: Removed destroyed structure [Tag:{tag}]")
 
-            # 7. 遍历所有已建成的生产建筑 (A)，并设置集结点
+            # 6. 遍历所有已建成的生产建筑 (A)，并设置集结点
             for structure in ready_combat_structures:
                 
-                # 找到最近的"集结中心" (B)
-                closest_center = all_ready_rally_centers.closest_to(structure.position)
+                # 找到地面路径最近的"集结中心" (B) (避免隔着悬崖选到直线最近的基地)
+                closest_center = min(
+                    all_ready_rally_centers,
+                    key=lambda center: self.pathing.distance(center.position, structure.position_tuple),
+                )
                 
                 # 获取这个"中心"对应的集结点
                 target_rally_point = rally_points_by_center_tag[closest_center.tag]
                 
-                # 8. [修改] 检查缓存的集结点是否与目标集结点不同
+                # 7. [修改] 检查缓存的集结点是否与目标集结点不同
                 cached_point = self.structure_rally_points.get(structure.tag)
 
                 if cached_point != target_rally_point:
@@ -892,18 +844,7 @@ class LLMPlayer(BasePlayer):
             """ 
             确保坐标点在地图边界内，且 X 和 Y 至少为 1。 
             """
-            map_width = self.game_info.map_size.width
-            map_height = self.game_info.map_size.height
-            
-            # 用户要求：如果计算出 0 或者 负数位置 取 1
-            x = max(1, p.x)
-            y = max(1, p.y)
-            
-            # 额外保护：确保不会超出地图边界 (减1是因为坐标从0开始)
-            x = min(x, map_width - 1)
-            y = min(y, map_height - 1)
-            
-            return Point2((x, y))
+            return self.map_info.clamp(p)
 
     async def manage_garrison(self):
             """
@@ -914,8 +855,7 @@ class LLMPlayer(BasePlayer):
             
             # 1. [修改] 检查是否有敌情 (使用 automatic_defense 的 10.0 半径)
             # 任何建筑附近 10.0 范围内有敌人，则跳过驻防调整
-            enemies_near_base = self.get_enemy_units_near_structures(10.0) 
-            if enemies_near_base.exists:
+            if self.enemies_near_base(10.0):
                 # print("敌情威胁中，暂停驻防调整。")
                 return # 存在敌情，不调整驻防
 
@@ -940,109 +880,64 @@ class LLMPlayer(BasePlayer):
             if not all_ready_rally_centers.exists:
                 return # 没有基地
             
-            map_center = self.game_info.map_center
             total_units_moved = 0
+            idle_arr = UnitArrays(idle_combat_units)
 
             for center in all_ready_rally_centers:
                 
-                # --- A. 计算 4 个驻防点 ---
-                
-                # 逻辑同 set_terran_combat_rally_points
-                main_rally_point = center.position.towards(map_center, 15)
-                
-                # Point 1 (50%): The main rally point
-                p1 = main_rally_point
-                
-                # Point 2 (10%): 在 指挥中心(center) 和 集结点(p1) 连线上，靠近指挥中心
-                p2 = main_rally_point.towards(center.position, self.GARRISON_EXTENSION_DISTANCE)
-                
-                # [修改] Points 3 & 4 (20% each): 在 指挥中心(center) 和 P1(main_rally_point) 连线的中点 做垂线
-                vector = main_rally_point.position - center.position
-
-                # [修复] 替换 .lerp()，手动计算中点 (P1 + P2) / 2
-                mid_point = (center.position + main_rally_point.position) / 2 # 计算中点
-                
-                if not vector.length: # 避免除零
-                    perp_vector = Point2((self.GARRISON_PERPENDICULAR_DISTANCE, 0))
-                else:
-                    # [修复] 替换 .rotated(90)，手动计算垂直向量
-                    # 2D 向量 (x, y) 旋转 90 度为 (-y, x)
-                    norm_vec = vector.normalized
-                    rotated_vec = Point2((-norm_vec.y, norm_vec.x))
-                    perp_vector = rotated_vec * self.GARRISON_PERPENDICULAR_DISTANCE
-                    
-                p3 = mid_point + perp_vector
-                p4 = mid_point - perp_vector
-
-                # [新增] 确保所有驻防点坐标合法（大于0且在地图内）
-                p1 = self._clamp_position_to_map_bounds(p1)
-                p2 = self._clamp_position_to_map_bounds(p2)
-                p3 = self._clamp_position_to_map_bounds(p3)
-                p4 = self._clamp_position_to_map_bounds(p4)
-                
-                # [修改] 按优先级排序：P1, P2, P3, P4
-                garrison_quotas_points = [
-                    (0.50, p1), # P1 (50%)
-                    (0.10, p2), # P2 (10%)
-                    (0.20, p3), # P3 (20%)
-                    (0.20, p4)  # P4 (20%)
-                ]
+                # --- A. 获取 4 个驻防点 (P1 50%, P2 10%, P3 20%, P4 20%) ---
+                # 几何位置在开局时由 map_info 预计算, 新基地首次查询时缓存
+                garrison_quotas_points = self.map_info.garrison_points(
+                    center.position, self.GARRISON_EXTENSION_DISTANCE, self.GARRISON_PERPENDICULAR_DISTANCE
+                )
+                p1 = garrison_quotas_points[0][1]
 
                 # --- B. 分配单位 ---
                 
                 # 1. 获取防区内的所有空闲单位 (只操作本防区的兵力)
                 # [注意] GARRISON_DEFENSE_ZONE_RADIUS (30) 仍然用于定义 *我方* 防区范围
-                units_in_zone = idle_combat_units.closer_than(self.GARRISON_DEFENSE_ZONE_RADIUS, center.position)
-                total_units_in_zone = units_in_zone.amount
+                # [numpy] 以下均使用 idle_arr 中的下标, 距离一次性向量化计算
+                available_ids = idle_arr.within(center.position, self.GARRISON_DEFENSE_ZONE_RADIUS)
+                # 地面单位按地面路径距离判断是否在防区内 (直线距离是路径距离的下界, 先用它粗筛)
+                ground_ids = available_ids[~idle_arr.is_flying[available_ids]]
+                path_distances = self.pathing.distances(center.position, idle_arr.positions[ground_ids])
+                outside = ground_ids[path_distances >= self.GARRISON_DEFENSE_ZONE_RADIUS]
+                available_ids = np.setdiff1d(available_ids, outside, assume_unique=True)
+                total_units_in_zone = len(available_ids)
                 
                 if total_units_in_zone == 0:
                     continue # 这个基地防区没兵，跳过
 
-                available_units = list(units_in_zone) # 可供分配的单位
                 units_moved_this_base = 0
+                check_radius_squared = self.GARRISON_CHECK_RADIUS ** 2
 
                 # 2. 按优先级遍历驻防点
                 for quota, point in garrison_quotas_points:
                     needed_count = math.ceil(total_units_in_zone * quota)
                     
                     # 检查有多少单位 *已经* 在这个点
-                    units_at_point = []
-                    remaining_available = []
-                    
-                    for u in available_units:
-                        if u.distance_to(point) <= self.GARRISON_CHECK_RADIUS:
-                            units_at_point.append(u)
-                        else:
-                            remaining_available.append(u)
-                    
-                    num_at_point = len(units_at_point)
-                    num_to_move = max(0, needed_count - num_at_point)
+                    distances_squared = idle_arr.distances_squared(point)
+                    at_point = distances_squared[available_ids] <= check_radius_squared
+                    ids_at_point = available_ids[at_point]
+                    num_to_move = max(0, needed_count - len(ids_at_point))
                     
-                    # a. 将已在位置的单位(最多needed_count个)标记为“已分配”
-                    # (我们只关心更新 available_units 列表)
-                    # final_assigned_at_point = units_at_point[:needed_count]
+                    # 将已在位置的单位(最多needed_count个)视为“已分配”,
+                    # 多余的单位 和 不在位置的单位 放回“可用”池
+                    available_ids = np.concatenate([available_ids[~at_point], ids_at_point[needed_count:]])
                     
-                    # b. 将多余的单位 和 不在位置的单位 放回“可用”池
-                    excess_units = units_at_point[needed_count:]
-                    available_units = remaining_available + excess_units
-                    
-                    # c. 如果还需要单位，从“可用”池中调拨 (如果兵力不够, available_units会变空, 自动满足 P1 > P2 > P3 > P4)
-                    if num_to_move > 0 and available_units:
-                        # 排序，找到最近的
-                        available_units.sort(key=lambda u: u.distance_to(point))
-                        
-                        units_to_move = available_units[:num_to_move]
-                        available_units = available_units[num_to_move:] # 更新“可用”池
-                        
-                        for u in units_to_move:
+                    # 如果还需要单位，从“可用”池中调拨最近的 (兵力不够时自动满足 P1 > P2 > P3 > P4)
+                    if num_to_move > 0 and len(available_ids):
+                        available_ids = available_ids[np.argsort(distances_squared[available_ids], kind="stable")]
+                        for u in idle_arr.take(available_ids[:num_to_move]):
                             u.move(point)
                             units_moved_this_base += 1
+                        available_ids = available_ids[num_to_move:] # 更新“可用”池
                 
                 # 3. 将所有剩余未分配的单位派往主集结点 (P1)
-                for u in available_units:
-                    if u.distance_to(p1) > self.GARRISON_CHECK_RADIUS:
-                        u.move(p1)
-                        units_moved_this_base += 1
+                far_from_p1 = idle_arr.distances_squared(p1)[available_ids] > check_radius_squared
+                for u in idle_arr.take(available_ids[far_from_p1]):
+                    u.move(p1)
+                    units_moved_this_base += 1
                 
                 if units_moved_this_base > 0:
                     print(f"Garrisoning Base {center.tag}: Reassigned {units_moved_this_base} units.")
@@ -1109,35 +1004,26 @@ class LLMPlayer(BasePlayer):
         # [V3] 首先, 更新我们的视野信息
         self._update_scouting_information()
         
-        # 1. 检查当前侦察单位的状态
+        # 1. 检查当前侦察单位的状态 (路线已作为排队指令下发, 这里只检查 tag 和剩余指令数)
         if self.active_scout_unit_tag:
             scout_unit = self.units.find_by_tag(self.active_scout_unit_tag)
             
-            # 侦察单位死亡或消失
+            # 侦察单位死亡或消失, 下一个侦察兵从路线的当前位置继续
             if not scout_unit: 
                 print(f"侦察单位 (Tag: {self.active_scout_unit_tag}) 丢失 (判定为死亡).")
                 self.active_scout_unit_tag = None
                 self.scout_target_location = None
             
-            # [V3 修改] 侦察单位变为空闲 (已到达目的地), 立即派遣到下一个最近的地点
+            # 侦察单位变为空闲: 整条路线已完成, 重新开始一轮
             elif scout_unit.is_idle: 
-                print(f"侦察单位 {scout_unit.type_id.name} (Tag: {self.active_scout_unit_tag}) 已变为空闲, 寻找下一个目标...")
-                
-                # [V3 新] 寻找离侦察兵 *当前位置* 最近的下一个目标
-                next_target = self._get_scout_target(from_position=scout_unit.position)
-                
-                if next_target:
-                    # [V3 新] 派遣到新目标
-                    self._send_scout(scout_unit, next_target)
-                else:
-                    # [V3 新] 找不到目标, 释放侦察兵
-                    print(f"侦察单位 {scout_unit.type_id.name} (Tag: {self.active_scout_unit_tag}) 已完成所有任务, 释放。")
-                    self.active_scout_unit_tag = None
-                    self.scout_target_location = None
+                print(f"侦察单位 {scout_unit.type_id.name} (Tag: {self.active_scout_unit_tag}) 已完成侦察路线, 开始新一轮。")
+                self.scouting_planner.update_progress(0)
+                self.scouted_locations.clear()
+                self._send_scout(scout_unit, self.scouting_planner.remaining())
             
-            # 否则, 单位还在路上, 什么都不做
+            # 否则, 单位还在路上, 记录路线进度
             else:
-                pass 
+                self.scouting_planner.update_progress(len(scout_unit.orders))
 
         # 2. 如果当前没有侦察单位, 尝试派遣一个新的
         if not self.active_scout_unit_tag:
@@ -1148,9 +1034,8 @@ class LLMPlayer(BasePlayer):
         按照 飞机 > Marine > SCV 的优先级, 寻找一个空闲单位并派遣它。
         """
         
-        # [V3 修改] 默认从基地出发寻找第一个目标
-        target = self._get_scout_target(from_position=self.start_location)
-        if not target:
+        targets = self.scouting_planner.remaining()
+        if not targets:
             # print("没有需要侦察的目标。")
             return # 没有可侦察的目标
 
@@ -1175,10 +1060,8 @@ class LLMPlayer(BasePlayer):
             scv_pool = self.workers.idle  # <-- 1. 优先尝试找空闲的
             if not scv_pool.exists:
                 # <-- 2. 如果找不到空闲的, 就从矿工里找
-                scv_pool = self.workers.filter(
-                    lambda w: w.is_gathering 
-                    and w.order_target in self.mineral_field.tags
-                )
+                # (采矿工人由 saturation_engine 按 gather 指令目标记录)
+                scv_pool = self.workers.tags_in(self.saturation_engine.mineral_worker_tags)
             if scv_pool.exists: # <-- 3. 只要池子里有单位 (无论是空闲的还是采矿的)
                 scout_unit = scv_pool.random
                 self.scv_scout_sent = True
@@ -1187,60 +1070,24 @@ class LLMPlayer(BasePlayer):
         # [V3 修正] 
         # 统一下发派遣命令 (原代码中此缩进错误, 导致飞机和Marine无法被派遣)
         if scout_unit:
-            self._send_scout(scout_unit, target)
-
-    def _get_scout_target(self, from_position=None):
-        """
-        决定下一个侦察目标点。
-        [V3 修改] 增加 from_position 参数, 用于计算最近距离。
-        
-        优先级:
-        1. 未侦察过的敌方出生点。
-        2. 未侦察过的矿区 (优先去近的)。
-        3. 已知的敌方基地 (如果所有点都侦察过了)。
-        """
-        
-        # [V3 新] 确定距离计算的基准点
-        base_position = from_position if from_position else self.start_location
-        
-        # 1. 敌方出生点
-        if self.enemy_start_locations:
-            enemy_start_loc = self.enemy_start_locations[0]
-            if enemy_start_loc not in self.scouted_locations:
-                return enemy_start_loc
-        
-        # 2. 未侦察过的矿区
-        unscouted_expansions = []
-        for exp_loc in self.expansion_locations_list:
-            if exp_loc not in self.scouted_locations:
-                unscouted_expansions.append(exp_loc)
-
-        if unscouted_expansions:
-            # [V3 修改] 返回距离 (base_position) 最近的那个未侦察矿区
-            return min(unscouted_expansions, key=lambda loc: loc.distance_to(base_position))
-        
-        # 3. 如果所有点都侦察过了, 重置侦察列表, 重新侦察敌方基地
-        if self.enemy_start_locations:
-            print("所有侦察点已完成, 循环重置。")
-            self.scouted_locations.clear() 
-            return self.enemy_start_locations[0]
+            self._send_scout(scout_unit, targets)
 
-        # 备用方案 (几乎不会触发)
-        return self.game_info.map_center
-
-    def _send_scout(self, unit, target):
+    def _send_scout(self, unit, targets):
         """
-        发送侦察单位并更新追踪变量的辅助函数。
+        发送侦察单位 (整条剩余路线作为 shift 排队指令) 并更新追踪变量的辅助函数。
         """
-        unit.move(target)
+        unit.move(targets[0])
+        for target in targets[1:]:
+            unit.move(target, queue=True)
+        self.scouting_planner.dispatched(len(targets))
         self.active_scout_unit_tag = unit.tag
-        self.scout_target_location = target
+        self.scout_target_location = targets[0]
         
-        # 当我们派遣单位时就标记该地点, 防止重复派遣
-        self.scouted_locations.add(target) 
+        # 当我们派遣单位时就标记这些地点, 防止重复派遣
+        self.scouted_locations.update(targets)
         
-        print(f"正在派遣 {unit.type_id.name} (Tag: {unit.tag}) 侦察 {target.rounded}")
-        self.logging("scouting", f"Dispatching {unit.type_id.name} to {target.rounded}")
+        print(f"正在派遣 {unit.type_id.name} (Tag: {unit.tag}) 侦察 {targets[0].rounded} 等 {len(targets)} 个地点")
+        self.logging("scouting", f"Dispatching {unit.type_id.name} to {targets[0].rounded} (+{len(targets) - 1} queued)")
 
 
     # --- 攻击逻辑 (V1: 多风格攻击) ---
@@ -1337,163 +1184,160 @@ class LLMPlayer(BasePlayer):
 
         self.total_attack_groups[wave_id] = {
             "unit_tags": unit_tags_set,
-            "target_tag": target_tag,         # 最终目标 (可能为 None)
-            "final_position": final_position, # (新) 最终目标坐标
+            "target_tag": None,               # 最终目标 (可能为 None)
+            "final_position": None,           # (新) 最终目标坐标
             "rally_point": rally_point,      
             "state": "GATHERING"         
         }
+        self._set_wave_target(wave_id, target_tag, final_position)
+        for tag in unit_tags_set:
+            self.unit_to_wave[tag] = wave_id
         
         self.logger.info(f"launch_total_attack: 已创建总攻波次 {wave_id}，状态: GATHERING。")
 
+    # --- 总攻编队的事件处理: 单位死亡 / 敌人进出视野只标记受影响的编队, 由 manage_total_attack_groups 处理 ---
+
+    async def on_unit_destroyed(self, unit_tag: int):
+        await super().on_unit_destroyed(unit_tag)
+        if unit_tag in self._structures_previous_map:
+            self.structure_grid_dirty = True
+        self.enemy_structure_index.remove(unit_tag)
+        wave_id = self.unit_to_wave.pop(unit_tag, None)
+        if wave_id is not None and wave_id in self.total_attack_groups:
+            self.total_attack_groups[wave_id]["unit_tags"].discard(unit_tag)
+            self.dirty_attack_waves.add(wave_id)
+        self._on_attack_target_lost(unit_tag)
+
+    async def on_enemy_unit_left_vision(self, unit_tag: int):
+        await super().on_enemy_unit_left_vision(unit_tag)
+        self.enemy_structure_index.remove(unit_tag)
+        self._on_attack_target_lost(unit_tag)
+
+    async def on_enemy_unit_entered_vision(self, unit: Unit):
+        if unit.is_structure:
+            self.enemy_structure_index.add(unit.tag, unit.position_tuple, unit)
+        # 无目标的编队 (SEEKING) 在有新敌人出现时重新索敌
+        for wave_id, attack_data in self.total_attack_groups.items():
+            if attack_data["state"] == "SEEKING":
+                self.dirty_attack_waves.add(wave_id)
+
+    def _on_attack_target_lost(self, target_tag: int):
+        """目标死亡或离开视野: 以它为目标的 ATTACKING 编队需要重新索敌"""
+        for wave_id in self.attack_target_to_waves.pop(target_tag, ()):
+            attack_data = self.total_attack_groups.get(wave_id)
+            if attack_data and attack_data["target_tag"] == target_tag:
+                self.dirty_attack_waves.add(wave_id)
+
+    def _attack_target_visible(self, target_tag) -> bool:
+        if target_tag is None:
+            return False
+        return target_tag in self.enemy_structure_index or self.enemy_units.find_by_tag(target_tag) is not None
+
+    def _set_wave_target(self, wave_id: int, target_tag, final_position):
+        attack_data = self.total_attack_groups[wave_id]
+        attack_data["target_tag"] = target_tag
+        attack_data["final_position"] = final_position
+        if target_tag is not None:
+            self.attack_target_to_waves.setdefault(target_tag, set()).add(wave_id)
+
+    def _delete_wave(self, wave_id: int):
+        attack_data = self.total_attack_groups.pop(wave_id)
+        for tag in attack_data["unit_tags"]:
+            self.unit_to_wave.pop(tag, None)
+        self.dirty_attack_waves.discard(wave_id)
+
+    def _retarget_wave(self, wave_id: int, live_units_in_group: Units):
+        """
+        原目标丢失 (或本就是坐标目标) 时整个小队自动索敌:
+        1. 优先 A-Move 离小队中心最近的【建筑】 (KD-tree 查询)。
+        2. 如果没有建筑, 再 A-Move 离小队中心最近的【单位】。
+        3. 视野里什么都没有时进入 SEEKING, 闲置单位 A-Move 至最后已知位置, 等待新敌人进入视野。
+        """
+        attack_data = self.total_attack_groups[wave_id]
+        self.logger.info(f"总攻波次 {wave_id}: 原目标 {attack_data['target_tag']} 丢失, 自动寻找新目标。")
+
+        squad_center = live_units_in_group.center
+        new_target = self.enemy_structure_index.nearest(squad_center)
+        if new_target is None and self.enemy_units.exists:
+            new_target = self.enemy_units.closest_to(squad_center)
+
+        if new_target is not None:
+            self.logger.info(f"总攻波次 {wave_id}: 锁定新目标 {new_target.name} (Tag: {new_target.tag})。")
+            for unit in live_units_in_group:
+                unit.attack(new_target)
+            self._set_wave_target(wave_id, new_target.tag, new_target.position)
+            attack_data["state"] = "ATTACKING"
+        else:
+            attack_data["state"] = "SEEKING"
+            if live_units_in_group.idle.exists:
+                final_target_pos = attack_data.get("final_position") or self.enemy_start_locations[0]
+                self.logger.info(f"总攻波次 {wave_id}: 目标丢失且无视野, 闲置单位 A-Move至最后已知位置。")
+                for unit in live_units_in_group.idle:
+                    unit.attack(final_target_pos)
+
     def manage_total_attack_groups(self):
-                """
-                【维护总攻编队】(在 on_step 中每帧调用)
-                
-                (V4: 严格按优先级索敌)
-                1. (剔除死亡)
-                2. (删除全灭记录)
-                3. (状态机)
-                - if GATHERING: ...
-                - if ATTACKING: (新逻辑) 检查主目标是否存活。
-                    - (是) (部队A-Move中，无需干预)
-                    - (否) 整个小队自动索敌:
-                        - 1. 优先 A-Move 离小队中心最近的【建筑】。
-                        - 2. 如果没有建筑, 再 A-Move 离小队中心最近的【单位】。
-                """
-                if not self.total_attack_groups:
-                    return
-
-                current_alive_unit_tags = {unit.tag for unit in self.units}
-                waves_to_delete = []
-                
-                # (已移除 Kiting 逻辑)
+        """
+        【维护总攻编队】(在 on_step 中调用)
 
-                for wave_id, attack_data in list(self.total_attack_groups.items()):
-                    
-                    group_unit_tags = attack_data["unit_tags"]
-                    
-                    # --- 1. 剔除死亡单位 ---
-                    dead_tags = group_unit_tags - current_alive_unit_tags
-                    if dead_tags:
-                        group_unit_tags.difference_update(dead_tags)
-
-                    # --- 2. 检查编队是否全灭 ---
-                    if not group_unit_tags:
-                        waves_to_delete.append(wave_id)
-                        self.logger.info(f"manage_total_attack_groups: 总攻波次 {wave_id} 已全灭。")
-                        continue
-
-                    # --- 3. 状态机逻辑 ---
-                    
-                    # 获取这个波次所有“存活”的单位对象
-                    live_units_in_group = self.units.filter(lambda u: u.tag in group_unit_tags)
-                    if not live_units_in_group.exists:
-                        continue # (安全检查)
+        (V5: 事件驱动的状态机)
+        - GATHERING: 每帧检查是否所有单位都已抵达集结点, 然后 A-Move 至最终目标 -> ATTACKING。
+        - ATTACKING: 无需每帧轮询; 我方单位死亡、目标死亡或离开视野的事件把编队标记为 dirty,
+          此处只处理 dirty 的编队 (剔除全灭编队, 目标丢失时重新索敌)。
+        - SEEKING: 视野中无目标; 有新敌人进入视野时被标记为 dirty 并重新索敌。
+        """
+        if not self.total_attack_groups:
+            return
 
-                    current_state = attack_data["state"]
+        dirty_waves = self.dirty_attack_waves
+        self.dirty_attack_waves = set()
 
-                    # --- 状态: GATHERING (集结中) ---
-                    if current_state == "GATHERING":
-                        rally_point = attack_data["rally_point"]
-                        
-                        units_not_at_rally = live_units_in_group.further_than(10.0, rally_point)
-                        
-                        if not units_not_at_rally.exists:
-                            # --- (触发) 所有单位都已抵达集结点 ---
-                            self.logger.info(f"总攻波次 {wave_id}: 集结完毕，发动进攻！")
-                            attack_data["state"] = "ATTACKING"
-                            
-                            # --- 【V3 修复：Plan B 逻辑】 ---
-                            final_target_pos = attack_data.get("final_position")
-                            if not final_target_pos:
-                                target_tag = attack_data.get("target_tag")
-                                final_target = None
-                                if target_tag:
-                                    if self.enemy_units.exists:
-                                        final_target = self.enemy_units.find_by_tag(target_tag)
-                                    if not final_target and self.enemy_structures.exists:
-                                        final_target = self.enemy_structures.find_by_tag(target_tag)
-                                
-                                if final_target:
-                                    final_target_pos = final_target.position
-                                else:
-                                    self.logger.warning(f"总攻波次 {wave_id}: 目标丢失, A-Move至敌方出生点。")
-                                    final_target_pos = self.enemy_start_locations[0]
-                                    
-                            # 统一 A-Move 到最终坐标
-                            for unit in live_units_in_group:
-                                unit.attack(final_target_pos)
-                            # --- 【V3 修复结束】 ---
-                        
-                        else:
-                            # --- (维持) 仍在集结中 ---
-                            idle_and_lost = live_units_in_group.idle.further_than(10.0, rally_point)
-                            if idle_and_lost.exists:
-                                self.rally_units_to_point(idle_and_lost, rally_point)
-
-                    # --- 状态: ATTACKING (进攻中) ---
-                    elif current_state == "ATTACKING":
-                        
-                        # --- 【!! 自动切换目标 V2 !!】 ---
-                        
-                        target_tag = attack_data.get("target_tag")
-                        target_alive = False
-                        
-                        if target_tag:
-                            # 检查目标是否在可见的敌方单位或建筑中
-                            if self.enemy_units.find_by_tag(target_tag):
-                                target_alive = True
-                            elif self.enemy_structures.find_by_tag(target_tag):
-                                target_alive = True
-                        
-                        # 如果原定目标 (target_tag) 已被消灭 (或不存在)
-                        if not target_alive:
-                            self.logger.info(f"总攻波次 {wave_id}: 原目标 {target_tag} 丢失, 自动寻找新目标。")
-                            
-                            # 1. 确定攻击小队的中心点
-                            squad_center = live_units_in_group.center
-                            
-                            # 2. 寻找最近的敌方目标 (【V4 修改】 优先建筑，然后单位)
-                            new_target = None
-                            
-                            # 【V4】 按照用户要求: 分别判断，优先建筑
-                            if self.enemy_structures.exists:
-                                # 优先：寻找最近的建筑
-                                new_target = self.enemy_structures.closest_to(squad_center)
-                            elif self.enemy_units.exists:
-                                # 其次：寻找最近的单位
-                                new_target = self.enemy_units.closest_to(squad_center)
-                            
-                            # 3. 如果找到了新目标
-                            if new_target:
-                                self.logger.info(f"总攻波次 {wave_id}: 锁定新目标 {new_target.name} (Tag: {new_target.tag})。")
-                                
-                                # A-Move 整个小队到新目标
-                                for unit in live_units_in_group:
-                                    unit.attack(new_target)
-                                
-                                # 4. 更新总攻数据，防止每帧都切换目标
-                                attack_data["target_tag"] = new_target.tag
-                                attack_data["final_position"] = new_target.position
-                            
-                            else:
-                                # 5. (备选) 如果视野里什么都看不到了
-                                if live_units_in_group.idle.exists:
-                                    final_target_pos = attack_data.get("final_position", self.enemy_start_locations[0])
-                                    self.logger.info(f"总攻波次 {wave_id}: 目标丢失且无视野, 闲置单位 A-Move至最后已知位置。")
-                                    for unit in live_units_in_group.idle:
-                                        unit.attack(final_target_pos)
-                        
-                        # (已移除 Kiting 逻辑)
-                        pass
+        for wave_id, attack_data in list(self.total_attack_groups.items()):
+            state = attack_data["state"]
+            if state != "GATHERING" and wave_id not in dirty_waves:
+                continue
+
+            group_unit_tags = attack_data["unit_tags"]
+            live_units_in_group = self.units.tags_in(group_unit_tags)
+            # 被装载等原因不在 self.units 中的单位同样移出编队
+            group_unit_tags.intersection_update(live_units_in_group.tags)
+            if not group_unit_tags:
+                self.logger.info(f"manage_total_attack_groups: 总攻波次 {wave_id} 已全灭。")
+                self._delete_wave(wave_id)
+                continue
 
+            # --- 状态: GATHERING (集结中) ---
+            if state == "GATHERING":
+                rally_point = attack_data["rally_point"]
+                units_not_at_rally = live_units_in_group.further_than(10.0, rally_point)
 
-                # --- 循环外：执行清理 (删除全灭的编队) ---
-                for wave_id in waves_to_delete:
-                    if wave_id in self.total_attack_groups:
-                        del self.total_attack_groups[wave_id]
+                if not units_not_at_rally.exists:
+                    # --- (触发) 所有单位都已抵达集结点 ---
+                    self.logger.info(f"总攻波次 {wave_id}: 集结完毕，发动进攻！")
+                    attack_data["state"] = "ATTACKING"
+
+                    final_target_pos = attack_data.get("final_position")
+                    if not final_target_pos:
+                        self.logger.warning(f"总攻波次 {wave_id}: 目标丢失, A-Move至敌方出生点。")
+                        final_target_pos = self.enemy_start_locations[0]
+
+                    # 统一 A-Move 到最终坐标
+                    for unit in live_units_in_group:
+                        unit.attack(final_target_pos)
+
+                    # 目标在集结期间已丢失 (或本就是坐标目标) 时, 立即索敌
+                    if not self._attack_target_visible(attack_data.get("target_tag")):
+                        self._retarget_wave(wave_id, live_units_in_group)
+                else:
+                    # --- (维持) 仍在集结中 ---
+                    idle_and_lost = live_units_in_group.idle.further_than(10.0, rally_point)
+                    if idle_and_lost.exists:
+                        self.rally_units_to_point(idle_and_lost, rally_point)
+                continue
+
+            # --- 状态: ATTACKING / SEEKING, 且被事件标记 ---
+            if state == "SEEKING" or not self._attack_target_visible(attack_data.get("target_tag")):
+                self._retarget_wave(wave_id, live_units_in_group)
 
-                # (已移除 Kiting 逻辑)
     # async def manage_attack(self):
     #     """
     #     【攻击总指挥】
@@ -1626,19 +1470,18 @@ class LLMPlayer(BasePlayer):
                     
                     target_unit_name_lower = target_unit_name.lower()
                     best_match_unit = None
+                    influence = self.snapshot.influence
                     
                     # 1. 尝试精确匹配
-                    for unit in all_enemies:
-                        if unit.name.lower() == target_unit_name_lower:
-                            best_match_unit = unit
-                            break
+                    matches = [unit for unit in all_enemies if unit.name.lower() == target_unit_name_lower]
                             
                     # 2. 如果没有精确匹配, 尝试包含匹配
-                    if not best_match_unit:
-                        for unit in all_enemies:
-                            if target_unit_name_lower in unit.name.lower():
-                                best_match_unit = unit
-                                break # 找到第一个包含的就用
+                    if not matches:
+                        matches = [unit for unit in all_enemies if target_unit_name_lower in unit.name.lower()]
+
+                    # 多个匹配时, 选择周围敌方兵力 (influence map) 最弱的那个
+                    if matches:
+                        best_match_unit = min(matches, key=lambda unit: influence.enemy_force(unit.position_tuple))
                     
                     if best_match_unit:
                         self.logger.info(f"已解析 target_unit '{target_unit_name}' -> 敌方 {best_match_unit.name} (Tag: {best_match_unit.tag})")
@@ -1658,8 +1501,15 @@ class LLMPlayer(BasePlayer):
                 )
                 
                 if enemy_townhalls.exists:
-                    # 找到离 *我方出生点* 最近的敌方基地
-                    closest_enemy_townhall = enemy_townhalls.closest_to(self.start_location)
+                    # 找到周围敌方兵力最弱的敌方基地, 兵力相同时取离 *我方出生点* 地面路径最近的
+                    influence = self.snapshot.influence
+                    closest_enemy_townhall = min(
+                        enemy_townhalls,
+                        key=lambda th: (
+                            influence.enemy_force(th.position_tuple),
+                            self.pathing.distance(self.start_location, th.position_tuple),
+                        ),
+                    )
                     final_targets.append(closest_enemy_townhall)
                     self.logger.warning(f"备选方案A: 锁定最近的敌方基地 {closest_enemy_townhall.name} (Tag: {closest_enemy_townhall.tag})。")
                 
@@ -1692,6 +1542,20 @@ class LLMPlayer(BasePlayer):
 
             num_targets = len(target_list)
 
+            # 位置目标: 改为攻击该位置 STRIKE_CLUSTER_RADIUS 内兵力最弱的敌方集群 (没有敌人时保持原位置)
+            influence = self.snapshot.influence
+            target_list = [
+                target if isinstance(target, Unit)
+                else influence.weakest_enemy_cluster(near=target, radius=self.STRIKE_CLUSTER_RADIUS) or target
+                for target in target_list
+            ]
+
+            # 目标按周围敌方兵力从弱到强排序: 兵力不足以覆盖所有目标时, 优先袭击防守最弱的目标
+            target_list = sorted(
+                target_list,
+                key=lambda t: influence.enemy_force(t.position_tuple if isinstance(t, Unit) else t),
+            )
+
             # --- 1. 选择兵力 (Selection) ---
             
             # 获取用于排序的"锚点"位置 (只使用第一个目标)
@@ -1707,12 +1571,10 @@ class LLMPlayer(BasePlayer):
                 self.logger.warning("发起袭击失败: available_unit_tags 不为空, 但找不到单位对象。")
                 return
 
-            # 按照距离锚点的远近排序
-            sorted_units = available_units.sorted(lambda u: u.distance_to(anchor_pos))
-            
-            # 选取指定数量的单位
+            # 选取距离锚点最近的指定数量的单位
             # (如果可用单位 < unit_count, units_to_assign 会包含所有可用单位)
-            units_to_assign = sorted_units.take(unit_count, -1)
+            available_arr = UnitArrays(available_units)
+            units_to_assign = self.units.subgroup(available_arr.take(available_arr.closest(anchor_pos, unit_count)))
             
             if not units_to_assign.exists:
                 self.logger.warning(f"发起袭击失败: 尝试选择 {unit_count} 个单位, 但没有单位被选中。")
@@ -1831,22 +1693,9 @@ class LLMPlayer(BasePlayer):
 #### shy_end ####
     
     async def run(self, iteration: int):
-        # send idle workers to minerals or gas automatically
-        await self.distribute_workers()
-        if self.config.own_race == "Terran":
-            await self.set_terran_combat_rally_points()
-            await self.automatic_defense()
-            await self.manage_scouting()
-            await self.manage_attack()
-
-            # --- [新增] 驻防逻辑 ---
-            # [修改] 每 224 帧（约10秒 @ 22.4 帧/秒）检查一次驻防
-            garrison_check_interval = 224
-            if iteration - self.last_garrison_check_time > garrison_check_interval:
-                await self.manage_garrison()
-                self.last_garrison_check_time = iteration
-            # --- [新增] 驻防逻辑 结束 ---
-            
+        # 工人分配 / 集结点 / 防御 / 侦察 / 总攻维护 / 驻防, 按周期与时间预算调度
+        await self.scheduler.run(iteration)
+
         # for unit in self.units:
         #     if unit.type_id in [UnitTypeId.MULE] or unit.is_constructing_scv:
         #         continue
@@ -1875,10 +1724,12 @@ class LLMPlayer(BasePlayer):
             or iteration == self.next_decision_time
         ):
             self.next_decision_time = iteration + 9 * decision_iteration
+            self.decision_count += 1
 
             self.log_current_iteration(iteration)
 
-            obs_text = await self.obs_to_text()
+            with self.profiler.section("obs_to_text"):
+                obs_text = await self.obs_to_text()
             
             # RAG is not ready yet, so we skip it for now
             # if self.config.enable_rag:
@@ -1894,7 +1745,8 @@ class LLMPlayer(BasePlayer):
                 self.logging("suggestions", suggestions, save_trace=True, print_log=False)
 
                 # 1. PlanAgent 运行
-                plans, plan_think, plan_chat_history = self.plan_agent.run(obs_text, verifier=self.plan_verifier, suggestions=suggestions)
+                with self.profiler.section("agent.plan"):
+                    plans, plan_think, plan_chat_history = self.plan_agent.run(obs_text, verifier=self.plan_verifier, suggestions=suggestions)
                 self.logging("plans", plans, save_trace=True)
                 self.logging("plan_think", plan_think, save_trace=True, print_log=False)
                 self.logging("plan_chat_history", plan_chat_history, save_trace=True, print_log=False)
@@ -1930,7 +1782,8 @@ class LLMPlayer(BasePlayer):
 
 
                     # AdjestAgent 接收 plans 列表并进行分类
-                    classified_results = self.adjest_agent.run(plans)
+                    with self.profiler.section("agent.adjest"):
+                        classified_results = self.adjest_agent.run(plans)
                     
                     # (重要) AdjestAgent 内部会保存累积的日志文件。
                     # 我们在这里 logging [当前轮次] 的结果
@@ -1955,7 +1808,8 @@ class LLMPlayer(BasePlayer):
                 # 所以这里的 actions 列表只包含 "Other Task" (如建造、训练)
                 other_commands = classified_results.get("other_tasks", [])
                 if other_commands:
-                    actions, action_think, action_chat_history = self.action_agent.run(obs_text, other_commands, verifier=self.action_verifier)
+                    with self.profiler.section("agent.action"):
+                        actions, action_think, action_chat_history = self.action_agent.run(obs_text, other_commands, verifier=self.action_verifier)
                     self.logging("actions", actions, save_trace=True)
                     self.logging("action_think", action_think, save_trace=True, print_log=False)
                     self.logging("action_chat_history", action_chat_history, save_trace=True, print_log=False)
@@ -1963,10 +1817,14 @@ class LLMPlayer(BasePlayer):
                     actions = []
             else:
                 # ... (else 分支保持不变)
-                actions, action_think, action_chat_history = self.agent.run(obs_text, verifier=self.action_verifier)
+                with self.profiler.section("agent.single"):
+                    actions, action_think, action_chat_history = self.agent.run(obs_text, verifier=self.action_verifier)
                 # ...
 
-            await self.run_actions(actions)
+            with self.profiler.section("run_actions"):
+                await self.run_actions(actions)
+            # 决策结束: trace 落盘并更新 manifest, 崩溃后可恢复到这一步
+            self.checkpoint_trace()
             
         elif iteration % 10 == 0:
             self.log_current_iteration(iteration)
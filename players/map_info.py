@@ -0,0 +1,117 @@
+from sc2.position import Point2
+
+
+class MapInfo:
+    """Static map geometry computed once in ``on_start``.
+
+    Resource fields, expansions, rally and garrison points never move during a
+    game, so they are ranked and formatted here once. Resources are keyed by
+    position because snapshot resources may change tags when they enter vision.
+    The only dynamic part is the removal of depleted resources.
+    """
+
+    N_RANKED_RESOURCES = 100
+
+    def __init__(self, bot):
+        self.start_location = bot.start_location
+        self.map_center = bot.game_info.map_center
+        self.map_width = bot.game_info.map_size.width
+        self.map_height = bot.game_info.map_size.height
+
+        # resources ranked by distance from our start location
+        self.mineral_ranking = self._rank_positions(bot.mineral_field)
+        self.geyser_ranking = self._rank_positions(bot.vespene_geyser)
+        self.position_text = {
+            p: f"({int(p.x)}, {int(p.y)})" for p in self.mineral_ranking + self.geyser_ranking
+        }
+
+        # resource clusters per expansion, expansions ranked by distance from our base
+        self.expansion_clusters = {}
+        for location, resources in bot.expansion_locations_dict.items():
+            self.expansion_clusters[location] = {
+                "minerals": [r.position for r in resources if r.is_mineral_field],
+                "geysers": [r.position for r in resources if r.is_vespene_geyser],
+            }
+        self.expansions_by_distance = sorted(
+            self.expansion_clusters, key=lambda p: p.distance_to(self.start_location)
+        )
+
+        # choke candidates: the main ramp (flat maps have none); the main base garrisons its top
+        self.choke_points = []
+        try:
+            ramp = bot.main_base_ramp
+            self.choke_points = [ramp.top_center, ramp.bottom_center]
+        except (ValueError, AttributeError):
+            pass
+
+        self._rally_points = {}
+        self._garrison_points = {}
+
+    def _rank_positions(self, resources):
+        positions = [r.position for r in resources]
+        positions.sort(key=lambda p: p.distance_to(self.start_location))
+        return positions[: self.N_RANKED_RESOURCES]
+
+    def remove_resource(self, position: Point2):
+        """Drop a depleted mineral field or geyser from the rankings."""
+        if position in self.position_text:
+            del self.position_text[position]
+            if position in self.mineral_ranking:
+                self.mineral_ranking.remove(position)
+            if position in self.geyser_ranking:
+                self.geyser_ranking.remove(position)
+
+    def clamp(self, p: Point2) -> Point2:
+        """Keep a point inside the map with x and y at least 1."""
+        x = min(max(1, p.x), self.map_width - 1)
+        y = min(max(1, p.y), self.map_height - 1)
+        return Point2((x, y))
+
+    def rally_point(self, position: Point2, distance: float = 15) -> Point2:
+        """Point ``distance`` away from ``position`` towards the map center."""
+        key = (position, distance)
+        if key not in self._rally_points:
+            self._rally_points[key] = position.towards(self.map_center, distance)
+        return self._rally_points[key]
+
+    def garrison_points(self, position: Point2, extension: float, perpendicular: float):
+        """Return [(quota, point), ...] garrison points of a base, P1 to P4 by priority.
+
+        P1 is the rally point, or the top of the main ramp for the main base, P2
+        lies on the base-P1 segment ``extension`` away from P1 (at most halfway to
+        the base), P3/P4 are ``perpendicular`` away from the midpoint on either side.
+        """
+        key = (position, extension, perpendicular)
+        if key in self._garrison_points:
+            return self._garrison_points[key]
+
+        if self.choke_points and position.distance_to(self.start_location) < 3:
+            p1 = self.choke_points[0]
+            extension = min(extension, p1.distance_to(position) / 2)
+        else:
+            p1 = self.rally_point(position)
+        p2 = p1.towards(position, extension)
+        vector = p1 - position
+        mid_point = (position + p1) / 2
+        if not vector.length:
+            perp_vector = Point2((perpendicular, 0))
+        else:
+            norm_vec = vector.normalized
+            perp_vector = Point2((-norm_vec.y, norm_vec.x)) * perpendicular
+        p3 = mid_point + perp_vector
+        p4 = mid_point - perp_vector
+
+        points = [
+            (0.50, self.clamp(p1)),
+            (0.10, self.clamp(p2)),
+            (0.20, self.clamp(p3)),
+            (0.20, self.clamp(p4)),
+        ]
+        self._garrison_points[key] = points
+        return points
+
+    def precompute_bases(self, extension: float, perpendicular: float):
+        """Warm the rally / garrison caches for every expansion location."""
+        for location in self.expansions_by_distance:
+            self.garrison_points(location, extension, perpendicular)
+
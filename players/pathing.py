@@ -0,0 +1,93 @@
+import math
+from collections import OrderedDict
+
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+import numpy as np
+
+
+class PathingOracle:
+    """Ground distances from anchor points over ``game_info.pathing_grid``.
+
+    The pathable cells form an 8-connected graph (cost 1 or sqrt(2)) built once;
+    a diagonal step needs both cells it passes between to be pathable, so paths
+    do not cut blocked corners.
+    the distance field of an anchor is one Dijkstra run over it, cached (LRU of
+    ``max_fields``) for the rest of the game. A distance is then an array lookup.
+    The grid is the static one from game start, so later buildings are ignored.
+    Unreachable cells are ``inf``.
+    """
+
+    def __init__(self, pathing_grid, max_fields: int = 32):
+        self.walkable = pathing_grid.data_numpy.astype(bool)
+        self.height, self.width = self.walkable.shape
+        self.max_fields = max_fields
+        self._graph = self._build_graph()
+        self._fields = OrderedDict()
+
+    def _build_graph(self):
+        h, w = self.walkable.shape
+        index = np.arange(h * w).reshape(h, w)
+        rows, cols, weights = [], [], []
+        for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            # cell (y, x) in the first slice is linked to (y + dy, x + dx) in the second
+            ys, ys2 = slice(0, h - dy), slice(dy, h)
+            xs, xs2 = slice(max(0, -dx), w - max(0, dx)), slice(max(0, dx), w + min(0, dx))
+            both = self.walkable[ys, xs] & self.walkable[ys2, xs2]
+            if dy and dx:
+                # no corner cutting: (y + dy, x) and (y, x + dx) must be pathable too
+                both &= self.walkable[ys2, xs] & self.walkable[ys, xs2]
+            rows.append(index[ys, xs][both])
+            cols.append(index[ys2, xs2][both])
+            weights.append(np.full(both.sum(), math.hypot(dy, dx)))
+        rows, cols, weights = np.concatenate(rows), np.concatenate(cols), np.concatenate(weights)
+        return csr_matrix((weights, (rows, cols)), shape=(h * w, h * w))
+
+    def cell_of(self, point):
+        y = min(max(int(point[1]), 0), self.height - 1)
+        x = min(max(int(point[0]), 0), self.width - 1)
+        return y, x
+
+    def _seed(self, point, radius: int = 4):
+        """The cell of ``point``, or the nearest pathable cell within ``radius`` (e.g. for a townhall)."""
+        y, x = self.cell_of(point)
+        if self.walkable[y, x]:
+            return y, x
+        y0, y1 = max(y - radius, 0), min(y + radius + 1, self.height)
+        x0, x1 = max(x - radius, 0), min(x + radius + 1, self.width)
+        ys, xs = np.nonzero(self.walkable[y0:y1, x0:x1])
+        if not len(ys):
+            return y, x
+        best = np.argmin((ys + y0 - y) ** 2 + (xs + x0 - x) ** 2)
+        return int(ys[best] + y0), int(xs[best] + x0)
+
+    def field(self, anchor) -> np.ndarray:
+        """(height, width) ground distances from ``anchor``."""
+        seed = self._seed(anchor)
+        if seed in self._fields:
+            self._fields.move_to_end(seed)
+            return self._fields[seed]
+        distances = dijkstra(self._graph, directed=False, indices=seed[0] * self.width + seed[1])
+        field = distances.reshape(self.height, self.width)
+        self._fields[seed] = field
+        if len(self._fields) > self.max_fields:
+            self._fields.popitem(last=False)
+        return field
+
+    def precompute(self, anchors):
+        for anchor in anchors:
+            self.field(anchor)
+
+    def distance(self, anchor, point) -> float:
+        """Ground distance from ``anchor`` to ``point`` (nearest pathable cell for blocked points)."""
+        return float(self.field(anchor)[self._seed(point)])
+
+    def distances(self, anchor, positions: np.ndarray) -> np.ndarray:
+        """Ground distances from ``anchor`` to an (n, 2) array of positions (blocked ones snapped like ``distance``)."""
+        field = self.field(anchor)
+        ys = np.clip(positions[:, 1].astype(int), 0, self.height - 1)
+        xs = np.clip(positions[:, 0].astype(int), 0, self.width - 1)
+        for i in np.nonzero(~self.walkable[ys, xs])[0]:
+            ys[i], xs[i] = self._seed(positions[i])
+        return field[ys, xs]
@@ -0,0 +1,105 @@
+from sc2.position import Point2
+
+import numpy as np
+
+
+class PlacementPlanner:
+    """Building slots computed from ``game_info.placement_grid``.
+
+    Occupied cells are counted per footprint and kept in sync with the tracked
+    units (our and enemy structures, resources) by tag, so only structures that
+    appeared, died or moved are stamped or cleared. For each building size (and
+    addon requirement) the valid slots are derived with an integral image and
+    cached until the occupancy changes.
+    """
+
+    # addon (2x2) relative to the center of a 3x3 production building
+    ADDON_OFFSET = (2.5, -0.5)
+
+    def __init__(self, placement_grid):
+        self.buildable = placement_grid.data_numpy.astype(bool)
+        self.height, self.width = self.buildable.shape
+        self.occupied = np.zeros(self.buildable.shape, dtype=np.int16)
+        self.footprints = {}  # tag -> (y0, y1, x0, x1)
+        self._slots = {}
+
+    # resources have no footprint_radius: mineral fields are 2x1, geysers 3x3
+    MINERAL_SIZE = (2, 1)
+    GEYSER_SIZE = (3, 3)
+
+    @staticmethod
+    def _rect(center, width: int, height: int = None):
+        height = width if height is None else height
+        x0 = int(round(center[0] - width / 2))
+        y0 = int(round(center[1] - height / 2))
+        return y0, y0 + height, x0, x0 + width
+
+    def _footprint(self, unit):
+        if unit.is_mineral_field:
+            return self._rect(unit.position_tuple, *self.MINERAL_SIZE)
+        if unit.is_vespene_geyser:
+            return self._rect(unit.position_tuple, *self.GEYSER_SIZE)
+        radius = unit.footprint_radius
+        if not radius or unit.is_flying:
+            return None
+        return self._rect(unit.position_tuple, int(round(2 * radius)))
+
+    def _stamp(self, rect, value: int):
+        y0, y1, x0, x1 = rect
+        self.occupied[max(y0, 0) : max(y1, 0), max(x0, 0) : max(x1, 0)] += value
+
+    def sync(self, units):
+        """Stamp new / moved units and clear the ones that are gone (``units``: grounded blockers)."""
+        current = {}
+        for unit in units:
+            rect = self._footprint(unit)
+            if rect is not None:
+                current[unit.tag] = rect
+        changed = False
+        for tag in list(self.footprints):
+            if current.get(tag) != self.footprints[tag]:
+                self._stamp(self.footprints.pop(tag), -1)
+                changed = True
+        for tag, rect in current.items():
+            if tag not in self.footprints:
+                self.footprints[tag] = rect
+                self._stamp(rect, 1)
+                changed = True
+        if changed:
+            self._slots = {}
+
+    def _windows_free(self, free: np.ndarray, size: int) -> np.ndarray:
+        """valid[y, x] is True when the size x size window starting at (y, x) is all free."""
+        integral = np.pad(free.astype(np.int32), ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+        sums = integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]
+        return sums == size * size
+
+    def slots(self, size: int, addon: bool = False) -> np.ndarray:
+        """(n, 2) array of building centers where the footprint (and addon) fits."""
+        key = (size, addon)
+        if key not in self._slots:
+            free = self.buildable & (self.occupied == 0)
+            valid = self._windows_free(free, size)
+            if addon:
+                addon_free = self._windows_free(free, 2)
+                # addon cells start 3 columns right of the building's first column, same first row
+                shifted = np.zeros_like(valid)
+                h = min(valid.shape[0], addon_free.shape[0])
+                w = min(valid.shape[1], addon_free.shape[1] - 3)
+                shifted[:h, :w] = addon_free[:h, 3 : 3 + w]
+                valid &= shifted
+            ys, xs = np.nonzero(valid)
+            self._slots[key] = np.stack([xs + size / 2, ys + size / 2], axis=1).astype(float)
+        return self._slots[key]
+
+    def candidates(self, size: int, near, max_distance: float, addon: bool = False, limit: int = 8) -> list:
+        """Up to ``limit`` slots within ``max_distance`` of ``near``, nearest first."""
+        slots = self.slots(size, addon)
+        if not len(slots):
+            return []
+        d2 = ((slots - (near[0], near[1])) ** 2).sum(axis=1)
+        inside = np.flatnonzero(d2 <= max_distance**2)
+        if not len(inside):
+            return []
+        order = inside[np.argsort(d2[inside], kind="stable")[:limit]]
+        return [Point2((float(x), float(y))) for x, y in slots[order]]
@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class ScoutingPlanner:
+    """Scouting tour over expansion locations, planned once at game start.
+
+    The tour starts at ``first`` (the enemy start location) and visits every
+    other location in the order of a nearest-neighbour path improved by 2-opt.
+    Costs are ground distances from ``pathing`` (a ``PathingOracle``) when
+    given, straight-line otherwise or where no ground path exists (islands);
+    ground distances are symmetrized for 2-opt. A scout gets the remaining part of the tour as
+    queued move commands; its progress is read back from the length of its
+    order queue, so a replacement scout resumes where the previous one died.
+    """
+
+    def __init__(self, first, locations, pathing=None):
+        self.points = [first] + [p for p in locations if p != first]
+        coords = np.array([(p.x, p.y) for p in self.points], dtype=float).reshape(-1, 2)
+        self.distances = np.sqrt(((coords[:, None, :] - coords[None, :, :]) ** 2).sum(axis=2))
+        if pathing is not None:
+            ground = np.array([pathing.distances(point, coords) for point in self.points])
+            ground = (ground + ground.T) / 2
+            reachable = np.isfinite(ground)
+            self.distances[reachable] = ground[reachable]
+        self.tour = self._two_opt(self._nearest_neighbour())
+        self.next_index = 0
+        self._dispatch_index = 0
+        self._dispatch_count = 0
+
+    def _nearest_neighbour(self) -> list:
+        order = [0]
+        unvisited = set(range(1, len(self.points)))
+        while unvisited:
+            last = order[-1]
+            nearest = min(unvisited, key=lambda i: (self.distances[last, i], i))
+            order.append(nearest)
+            unvisited.remove(nearest)
+        return order
+
+    def _two_opt(self, order: list) -> list:
+        """Reverse segments of the open path (start fixed) while that shortens it."""
+        d = self.distances
+        n = len(order)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, n - 1):
+                for j in range(i + 1, n):
+                    a, b = order[i - 1], order[i]
+                    c = order[j]
+                    delta = d[a, c] - d[a, b]
+                    if j + 1 < n:
+                        e = order[j + 1]
+                        delta += d[b, e] - d[c, e]
+                    if delta < -1e-9:
+                        order[i : j + 1] = order[i : j + 1][::-1]
+                        improved = True
+        return order
+
+    def tour_length(self) -> float:
+        return float(sum(self.distances[a, b] for a, b in zip(self.tour, self.tour[1:])))
+
+    def remaining(self) -> list:
+        """Locations still to visit; starts a new round when the tour is complete."""
+        if self.next_index >= len(self.tour):
+            self.next_index = 0
+        return [self.points[i] for i in self.tour[self.next_index :]]
+
+    def dispatched(self, count: int):
+        self._dispatch_index = self.next_index
+        self._dispatch_count = count
+
+    def update_progress(self, orders_left: int):
+        """Advance the tour position from the number of queued orders the scout has left."""
+        self.next_index = self._dispatch_index + max(0, self._dispatch_count - orders_left)
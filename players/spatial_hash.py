@@ -0,0 +1,109 @@
+import math
+
+
+class SpatialHash:
+    """Uniform grid of items bucketed by the cell of their position.
+
+    Radius and nearest queries only visit the cells around the query point.
+    ``coverage(r)`` is the set of cells that may hold a point closer than ``r``
+    to some item; it is cached per radius until the grid is rebuilt, so most
+    far-away queries are rejected with one set lookup.
+    """
+
+    def __init__(self, cell_size: float = 8.0):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+        self._bounds = None
+        self._coverage = {}
+
+    def __len__(self):
+        return self.size
+
+    def cell_of(self, point):
+        return (int(point[0] // self.cell_size), int(point[1] // self.cell_size))
+
+    def build(self, items):
+        """Replace the content with ``items`` (anything with ``position_tuple``)."""
+        self.cells = {}
+        self.size = 0
+        self._bounds = None
+        self._coverage = {}
+        for item in items:
+            self.insert(item)
+        return self
+
+    def insert(self, item):
+        position = item.position_tuple
+        cell = self.cell_of(position)
+        self.cells.setdefault(cell, []).append((position[0], position[1], item))
+        self.size += 1
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            b = self._bounds
+            b[0], b[1] = min(b[0], cell[0]), min(b[1], cell[1])
+            b[2], b[3] = max(b[2], cell[0]), max(b[3], cell[1])
+        self._coverage = {}
+
+    def _cell_range(self, x, y, r):
+        cs = self.cell_size
+        return range(int((x - r) // cs), int((x + r) // cs) + 1), range(int((y - r) // cs), int((y + r) // cs) + 1)
+
+    def coverage(self, r: float) -> set:
+        if r not in self._coverage:
+            covered = set()
+            for entries in self.cells.values():
+                for x, y, _ in entries:
+                    xs, ys = self._cell_range(x, y, r)
+                    covered.update((cx, cy) for cx in xs for cy in ys)
+            self._coverage[r] = covered
+        return self._coverage[r]
+
+    def within(self, point, r: float) -> list:
+        """Items strictly closer than ``r`` to ``point``."""
+        px, py = point[0], point[1]
+        r2 = r * r
+        xs, ys = self._cell_range(px, py, r)
+        found = []
+        for cx in xs:
+            for cy in ys:
+                for x, y, item in self.cells.get((cx, cy), ()):
+                    if (x - px) ** 2 + (y - py) ** 2 < r2:
+                        found.append(item)
+        return found
+
+    def any_within(self, point, r: float) -> bool:
+        if self.cell_of(point) not in self.coverage(r):
+            return False
+        px, py = point[0], point[1]
+        r2 = r * r
+        xs, ys = self._cell_range(px, py, r)
+        for cx in xs:
+            for cy in ys:
+                for x, y, _ in self.cells.get((cx, cy), ()):
+                    if (x - px) ** 2 + (y - py) ** 2 < r2:
+                        return True
+        return False
+
+    def nearest(self, point):
+        """Item closest to ``point`` by ring search over cells, None if empty."""
+        if not self.size:
+            return None
+        px, py = point[0], point[1]
+        ccx, ccy = self.cell_of(point)
+        b = self._bounds
+        max_ring = max(abs(ccx - b[0]), abs(ccx - b[2]), abs(ccy - b[1]), abs(ccy - b[3]))
+        best, best_d2 = None, math.inf
+        for k in range(max_ring + 1):
+            for cx in range(ccx - k, ccx + k + 1):
+                step = 1 if abs(cx - ccx) == k else 2 * k
+                for cy in range(ccy - k, ccy + k + 1, max(step, 1)):
+                    for x, y, item in self.cells.get((cx, cy), ()):
+                        d2 = (x - px) ** 2 + (y - py) ** 2
+                        if d2 < best_d2:
+                            best, best_d2 = item, d2
+            # cells of ring k+1 and beyond are at least k * cell_size away
+            if best is not None and best_d2 <= (k * self.cell_size) ** 2:
+                break
+        return best
@@ -0,0 +1,149 @@
+from functools import cached_property
+
+from scipy.spatial import cKDTree
+from sc2.unit import Unit
+
+from .influence_map import InfluenceMap
+
+import numpy as np
+
+
+class UnitArrays:
+    """Positions, types, health and flags of a group of units as numpy arrays.
+
+    Indices returned by the queries refer to ``self.units``; use ``take`` to turn
+    them back into ``Unit`` objects.
+    """
+
+    def __init__(self, units):
+        self.units = list(units)
+        n = len(self.units)
+        self.tags = np.fromiter((u.tag for u in self.units), dtype=np.int64, count=n)
+        self.type_ids = np.fromiter((u.type_id.value for u in self.units), dtype=np.int32, count=n)
+        self.positions = np.array([u.position_tuple for u in self.units], dtype=float).reshape(n, 2)
+        self.health = np.fromiter((u.health + u.shield for u in self.units), dtype=float, count=n)
+
+    def __len__(self):
+        return len(self.units)
+
+    @cached_property
+    def is_idle(self) -> np.ndarray:
+        return np.fromiter((u.is_idle for u in self.units), dtype=bool, count=len(self.units))
+
+    @cached_property
+    def is_flying(self) -> np.ndarray:
+        return np.fromiter((u.is_flying for u in self.units), dtype=bool, count=len(self.units))
+
+    @cached_property
+    def can_attack(self) -> np.ndarray:
+        return np.fromiter((u.can_attack for u in self.units), dtype=bool, count=len(self.units))
+
+    @cached_property
+    def tag_to_index(self) -> dict:
+        return {tag: i for i, tag in enumerate(self.tags.tolist())}
+
+    def take(self, indices) -> list:
+        return [self.units[i] for i in indices]
+
+    def distances_squared(self, point) -> np.ndarray:
+        if isinstance(point, Unit):
+            point = point.position
+        return ((self.positions - (point[0], point[1])) ** 2).sum(axis=1)
+
+    def distances(self, point) -> np.ndarray:
+        return np.sqrt(self.distances_squared(point))
+
+    def within(self, point, radius: float) -> np.ndarray:
+        """Indices of units strictly closer than ``radius`` to ``point``."""
+        return np.flatnonzero(self.distances_squared(point) < radius**2)
+
+    def closest(self, point, k: int = 1) -> np.ndarray:
+        """Indices of the ``k`` closest units, nearest first (ties keep input order)."""
+        d2 = self.distances_squared(point)
+        if k <= 0:
+            return np.array([], dtype=int)
+        if k < len(d2):
+            candidates = np.argpartition(d2, k - 1)[:k]
+            return candidates[np.argsort(d2[candidates], kind="stable")]
+        return np.argsort(d2, kind="stable")
+
+    def pairwise_distances_squared(self, other: "UnitArrays") -> np.ndarray:
+        """(len(self), len(other)) matrix of squared distances."""
+        diff = self.positions[:, None, :] - other.positions[None, :, :]
+        return (diff**2).sum(axis=2)
+
+    def within_any(self, other: "UnitArrays", radius: float) -> np.ndarray:
+        """Boolean mask of units closer than ``radius`` to any unit of ``other``."""
+        if len(self) == 0 or len(other) == 0:
+            return np.zeros(len(self), dtype=bool)
+        return (self.pairwise_distances_squared(other) < radius**2).any(axis=1)
+
+
+class FrameSnapshot:
+    """Per-frame ``UnitArrays`` of our units, structures and visible enemies, and the influence map, built lazily."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.game_loop = bot.state.game_loop
+
+    @cached_property
+    def units(self) -> UnitArrays:
+        return UnitArrays(self.bot.units)
+
+    @cached_property
+    def structures(self) -> UnitArrays:
+        return UnitArrays(self.bot.structures)
+
+    @cached_property
+    def enemy_units(self) -> UnitArrays:
+        return UnitArrays(self.bot.enemy_units)
+
+    @cached_property
+    def enemy_structures(self) -> UnitArrays:
+        return UnitArrays(self.bot.enemy_structures)
+
+    @cached_property
+    def influence(self) -> InfluenceMap:
+        return InfluenceMap.from_bot(self.bot)
+
+
+class PointIndex:
+    """Tag -> (position, item) set with nearest queries.
+
+    The KD-tree is rebuilt lazily on the first query after an add/remove, so a
+    burst of changes costs one rebuild and each query is O(log n).
+    """
+
+    def __init__(self):
+        self.positions = {}
+        self.items = {}
+        self._tags = []
+        self._tree = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, tag):
+        return tag in self.positions
+
+    def add(self, tag: int, position, item=None):
+        self.positions[tag] = (position[0], position[1])
+        self.items[tag] = item
+        self._tree = None
+
+    def remove(self, tag: int):
+        if self.positions.pop(tag, None) is not None:
+            self.items.pop(tag, None)
+            self._tree = None
+
+    def nearest(self, point):
+        """Item (or tag when no item was stored) nearest to ``point``, None if empty."""
+        if not self.positions:
+            return None
+        if self._tree is None:
+            self._tags = list(self.positions)
+            self._tree = cKDTree(np.array([self.positions[t] for t in self._tags], dtype=float))
+        _, i = self._tree.query((point[0], point[1]))
+        tag = self._tags[i]
+        item = self.items[tag]
+        return tag if item is None else item
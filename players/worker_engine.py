@@ -0,0 +1,148 @@
+from collections import Counter
+
+from scipy.optimize import linear_sum_assignment
+
+import numpy as np
+
+
+class SaturationEngine:
+    """Worker saturation solved as a small min-cost assignment.
+
+    Each run the worker -> resource assignment is read from the workers' gather
+    order targets (workers returning cargo keep their last resource, and workers
+    out of the observation, e.g. inside a refinery, keep theirs for up to
+    ``vanish_loops`` game loops). Refinery occupancy is taken from the game's
+    ``assigned_harvesters``, which counts workers inside the refinery. The solver
+    only runs when that saturation picture changed, or once ``force_interval``
+    game loops passed since the last solve in case an issued order did not take
+    effect. Both windows are in game loops (22.4 per game second), independent
+    of how often ``run`` is called.
+
+    Rows are the workers that may move: idle workers, workers above a resource's
+    capacity and, for refineries that are short of workers, mineral workers from
+    patches within ``gas_pull_radius`` of the refinery. Columns are the open
+    slots, one per missing harvester. The cost is the distance, minus
+    ``gas_bonus`` for refinery slots so that gas is filled first.
+    """
+
+    FORBIDDEN = 1e6
+
+    def __init__(
+        self,
+        mineral_capacity: int = 2,
+        gas_bonus: float = 4.0,
+        gas_pull_radius: float = 15,
+        force_interval: int = 44,
+        vanish_loops: int = 112,
+    ):
+        self.mineral_capacity = mineral_capacity
+        self.gas_bonus = gas_bonus
+        self.gas_pull_radius = gas_pull_radius
+        self.force_interval = force_interval
+        self.vanish_loops = vanish_loops
+
+        self.worker_resource = {}  # worker tag -> resource tag
+        self._last_seen = {}  # worker tag -> game loop
+        self.mineral_worker_tags = set()
+        self._signature = None
+        self._last_solve_loop = None
+
+    def snapshot(self, workers, resource_tags, game_loop: int):
+        """Return ({worker_tag: resource_tag}, [idle workers]) at ``game_loop``."""
+        assignment = {}
+        idle = []
+        for worker in workers:
+            self._last_seen[worker.tag] = game_loop
+            target = worker.order_target
+            if worker.is_gathering and target in resource_tags:
+                assignment[worker.tag] = target
+            elif worker.is_returning and self.worker_resource.get(worker.tag) in resource_tags:
+                assignment[worker.tag] = self.worker_resource[worker.tag]
+            elif worker.is_idle:
+                idle.append(worker)
+        # workers missing from the observation (inside a refinery) keep their resource for a while
+        for worker_tag, resource_tag in self.worker_resource.items():
+            if worker_tag in self._last_seen and worker_tag not in assignment and resource_tag in resource_tags:
+                if game_loop - self._last_seen[worker_tag] <= self.vanish_loops:
+                    assignment[worker_tag] = resource_tag
+        self._last_seen = {tag: loop for tag, loop in self._last_seen.items() if game_loop - loop <= self.vanish_loops}
+        self.worker_resource = assignment
+        return assignment, idle
+
+    def run(self, workers, mineral_patches, refineries, game_loop: int):
+        """Return the [(worker, resource), ...] gather orders that improve saturation."""
+        minerals = {m.tag: m for m in mineral_patches}
+        gases = {g.tag: g for g in refineries}
+        capacity = {tag: self.mineral_capacity for tag in minerals}
+        capacity.update({tag: g.ideal_harvesters for tag, g in gases.items()})
+
+        assignment, idle = self.snapshot(workers, capacity.keys(), game_loop)
+        counts = Counter(assignment.values())
+        for tag, gas in gases.items():
+            counts[tag] = gas.assigned_harvesters
+        self.mineral_worker_tags = {w for w, r in assignment.items() if r in minerals}
+
+        signature = (
+            tuple(sorted((tag, counts[tag], cap) for tag, cap in capacity.items())),
+            tuple(sorted(worker.tag for worker in idle)),
+        )
+        forced = self._last_solve_loop is None or game_loop - self._last_solve_loop >= self.force_interval
+        if signature == self._signature and not forced:
+            return []
+        self._signature = signature
+        self._last_solve_loop = game_loop
+
+        workers_by_tag = {worker.tag: worker for worker in workers}
+        workers_at = {}  # visible workers per resource
+        for worker_tag, resource_tag in assignment.items():
+            if worker_tag in workers_by_tag:
+                workers_at.setdefault(resource_tag, []).append(workers_by_tag[worker_tag])
+
+        # columns: one per missing harvester
+        slots = []
+        for tag, cap in capacity.items():
+            slots += [tag] * max(0, cap - counts[tag])
+        if not slots:
+            return []
+
+        # rows: idle workers, workers above capacity, then mineral workers that may move to gas
+        free_workers = list(idle)
+        for tag, cap in capacity.items():
+            if tag in gases:
+                # surplus_harvesters counts workers inside the refinery; move visible ones
+                free_workers += workers_at.get(tag, [])[: max(0, gases[tag].surplus_harvesters)]
+            else:
+                free_workers += workers_at.get(tag, [])[cap:]
+        gas_short = any(tag in gases for tag in slots)
+        pullable = []
+        if gas_short:
+            free_tags = {worker.tag for worker in free_workers}
+            for tag in minerals:
+                pullable += [w for w in workers_at.get(tag, [])[: capacity[tag]] if w.tag not in free_tags]
+        rows = free_workers + pullable
+        if not rows:
+            return []
+
+        row_pos = np.array([w.position_tuple for w in rows], dtype=float).reshape(-1, 2)
+        slot_units = [gases.get(tag) or minerals[tag] for tag in slots]
+        slot_pos = np.array([u.position_tuple for u in slot_units], dtype=float).reshape(-1, 2)
+        cost = np.sqrt(((row_pos[:, None, :] - slot_pos[None, :, :]) ** 2).sum(axis=2))
+
+        is_gas_slot = np.array([tag in gases for tag in slots])
+        cost[:, is_gas_slot] -= self.gas_bonus
+        if pullable:
+            # mineral workers only move to gas, and only to refineries close to their patch
+            n_free = len(free_workers)
+            cost[n_free:, ~is_gas_slot] = self.FORBIDDEN
+            patch_pos = np.array(
+                [minerals[self.worker_resource[w.tag]].position_tuple for w in pullable], dtype=float
+            )
+            patch_to_slot = np.sqrt(((patch_pos[:, None, :] - slot_pos[None, :, :]) ** 2).sum(axis=2))
+            cost[n_free:][patch_to_slot >= self.gas_pull_radius] = self.FORBIDDEN
+
+        row_ids, col_ids = linear_sum_assignment(cost)
+        orders = []
+        for r, c in zip(row_ids, col_ids):
+            if cost[r, c] < self.FORBIDDEN:
+                orders.append((rows[r], slot_units[c]))
+        return orders
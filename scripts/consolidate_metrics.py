@@ -0,0 +1,32 @@
+import glob
+import os
+import sys
+from argparse import ArgumentParser
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.metrics import consolidate_metrics
+from tools.results import load_results
+
+parser = ArgumentParser(description="Consolidate the per-game metrics of many games into one columnar file.")
+parser.add_argument("pattern", help='game log folders, glob allowed, e.g. "logs/*_benchmark/*/*/*"')
+parser.add_argument("--output", default="logs/metrics_all.npz", help=".npz, or .parquet (needs pyarrow)")
+args = parser.parse_args()
+
+folders = sorted(d for d in glob.glob(args.pattern) if os.path.isdir(d))
+merged = consolidate_metrics(folders)
+# 每局的结果 (来自 results 索引), 方便按胜负筛选
+results = load_results(folders)
+merged["results"] = np.array([(results[f] or {}).get("result", "") for f in folders], dtype=str)
+
+if args.output.endswith(".parquet"):
+    import pandas as pd
+
+    table = {key: value for key, value in merged.items() if key not in ["folders", "results"]}
+    table["folder"] = merged["folders"][merged["game"]]
+    table["result"] = merged["results"][merged["game"]]
+    pd.DataFrame(table).to_parquet(args.output, index=False)
+else:
+    np.savez_compressed(args.output, **merged)
+print(f"Wrote {len(merged['game'])} rows of {len(folders)} games to {args.output}")
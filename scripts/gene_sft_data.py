@@ -10,6 +10,11 @@ from typing import List
 from sklearn.preprocessing import StandardScaler
 from collections import defaultdict
 import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.metrics import VALUE_KEYS
+from tools.trace_io import trace_path, read_trace
 
 
 def get_order_of_magnitude(num):
@@ -53,13 +58,14 @@ def draw_list(data: List, title: str = "", bins="auto"):
 
 trace_files = []
 for folders in [
-    "logs/sc2agent_0731/Flat48_Medium*/*/*/trace.json",
-    "logs/sc2agent_0731/Flat48_MediumHard*/*/*/trace.json",
-    # "logs/PvP_benchmark/*/deepseek-chat/*/trace.json",
-    # "logs/ZvZ_benchmark/*/deepseek-chat/*/trace.json",
-    # "logs/TvT_benchmark/*/deepseek-chat/*/trace.json",
+    "logs/sc2agent_0731/Flat48_Medium*/*/*",
+    "logs/sc2agent_0731/Flat48_MediumHard*/*/*",
+    # "logs/PvP_benchmark/*/deepseek-chat/*",
+    # "logs/ZvZ_benchmark/*/deepseek-chat/*",
+    # "logs/TvT_benchmark/*/deepseek-chat/*",
 ]:
-    trace_files.extend(glob.glob(folders))
+    # trace.jsonl, 旧日志为 trace.json
+    trace_files.extend(f for f in map(trace_path, glob.glob(folders)) if f is not None)
 
 plan_time_cnter = Counter()
 action_time_cnter = Counter()
@@ -67,38 +73,42 @@ action_counter = Counter()
 
 sft_trace = []
 
-score_items = [
-    "unit_mineral_value_score",
-    "unit_vespene_value_score",
-    "structure_mineral_value_score",
-    "structure_vespene_value_score",
-    "supply_army_score",
-    "supply_workers_score",
-]
+score_items = [f"{key}_score" for key in VALUE_KEYS]
 
 score_hist = {item: [] for item in score_items}
 score_scalers = {item: StandardScaler() for item in score_items}
 
 
-def get_step_value_diff(s1, s2):
-    score = {}
-    for item in score_items:
-        key = item.replace("_score", "")
-        score[item] = s2[key] - s1[key]
-        iteration_diff = (s2["iteration"] - s1["iteration"]) / 10
-        score[item] *= 0.95**iteration_diff
-    return score
-
+def get_trace_scores(trace_list: List, window: int = 15):
+    """Discounted value growth over the next `window` steps, for every step at once.
 
-def add_dict(d1, d2):
-    assert d1.keys() == d2.keys()
-    res = {}
-    for item in d1.keys():
-        res[item] = d1[item] + d2[item]
-    return res
+    Steps without metrics (chat/obs-only steps, old traces) take the last known
+    values; steps before the first metrics get NaN scores.
+    """
+    keys = ["iteration"] + VALUE_KEYS
+    rows = np.array([[trace.get(key, np.nan) for key in keys] for trace in trace_list], dtype=float).reshape(-1, len(keys))
+    # forward-fill missing metrics
+    for j in range(rows.shape[1]):
+        column = rows[:, j]
+        valid = ~np.isnan(column)
+        last = np.where(valid, np.arange(len(column)), 0)
+        np.maximum.accumulate(last, out=last)
+        filled = column[last]
+        filled[np.cumsum(valid) == 0] = np.nan
+        rows[:, j] = filled
+    iterations, values = rows[:, 0], rows[:, 1:]
+    scores = np.zeros_like(values)
+    for offset in range(1, window + 1):
+        if offset >= len(values):
+            break
+        diff = values[offset:] - values[:-offset]
+        discount = 0.95 ** ((iterations[offset:] - iterations[:-offset]) / 10)
+        scores[:-offset] += diff * discount[:, None]
+    return scores
 
 
 def process_trace(trace_list: List):
+    scores = get_trace_scores(trace_list)
     for i, trace in enumerate(trace_list):
         if (
             "obs" not in trace
@@ -109,14 +119,10 @@ def process_trace(trace_list: List):
             or len(trace["actions"]) != len(trace["valid_actions"])
             or len(trace["plans"]) > 5
             or '"error_number": 0' not in trace["plan_think"][-1][-1]
+            or np.isnan(scores[i]).any()
         ):
             continue
-        score = {item: 0.0 for item in score_items}
-        for next_i in range(i + 1, i + 16):
-            if next_i == len(trace_list):
-                break
-            step_score = get_step_value_diff(trace_list[i], trace_list[next_i])
-            score = add_dict(score, step_score)
+        score = dict(zip(score_items, scores[i].tolist()))
         for item in score_items:
             score_hist[item].append(score[item])
         sft_trace.append(
@@ -132,14 +138,13 @@ RACE = "Protoss"
 n_trace = 0
 for trace_file in tqdm(trace_files):
     # tqdm.write(f"Processing {trace_file}...")
-    config_file = trace_file.replace("trace.json", "config.json")
+    config_file = os.path.join(os.path.dirname(trace_file), "config.json")
     with open(config_file, "r", encoding="utf-8") as f:
         config_data = json.load(f)
     if config_data["own_race"] != RACE:
         continue
 
-    with open(trace_file, "r", encoding="utf-8") as f:
-        trace_data = json.load(f)
+    trace_data = read_trace(trace_file)
     trace_list = list(trace_data.values())
     if "game_result" not in trace_list[-1] or trace_list[-1]["game_result"] != "Victory":
         continue
@@ -0,0 +1,16 @@
+import glob
+import os
+import sys
+from argparse import ArgumentParser
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.adjest_agent import compact_classification_logs
+
+parser = ArgumentParser(description="Merge the AdjestAgent JSONL classification streams into cumulative JSON files.")
+parser.add_argument("pattern", help='game log folder(s), glob allowed, e.g. "logs/*_benchmark/*/*/*"')
+parser.add_argument("--output_dir", default="logs/classification_merged")
+args = parser.parse_args()
+
+log_dirs = sorted(d for d in glob.glob(args.pattern) if os.path.isdir(d))
+counts = compact_classification_logs(log_dirs, args.output_dir)
+print(f"Merged {len(log_dirs)} folders into {args.output_dir}: {counts}")
@@ -1,5 +1,10 @@
 from glob import glob
+import os
 import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.results import load_results
 
 # --- ELO 配置 ---
 INITIAL_ELO = 1000
@@ -34,28 +39,30 @@ def calculate_new_elos(elo_a, elo_b, score_a):
 
 # --- 数据加载 ---
 # 使用通配符匹配所有对战日志
-log_path_pattern = "logs/elo/*/Flat32/*/*/*/trace.json"
-trace_files = glob(log_path_pattern)
+log_path_pattern = "logs/elo/*/Flat32/*/*/*"
+# 比赛结果来自共享索引 (logs/results_index.json), 新比赛读取 result.json, 旧日志回退到 trace
+results = load_results(sorted(glob(log_path_pattern)))
+game_folders = [folder for folder, result in results.items() if result is not None]
 
 # 打乱比赛顺序以避免潜在的顺序偏差
 random.seed(100)
-random.shuffle(trace_files)
+random.shuffle(game_folders)
 
-print(f"找到 {len(trace_files)} 个对战日志文件。")
+print(f"找到 {len(game_folders)} 个对战日志文件。")
 
 # ELO分数表，将动态填充
 elo_scores = {}
 
 # --- ELO 计算循环 ---
-for trace_file in trace_files:
+for game_folder in game_folders:
     try:
         # 从文件路径中解析元信息
-        # 路径结构: logs/elo/Protoss/Flat32/{matchup}/{p1_model}/{timestamp}/trace.json
+        # 路径结构: logs/elo/Protoss/Flat32/{matchup}/{p1_model}/{timestamp}
         # 例如: .../Flat32/Qwen3-8B v.s. deepseek-chat/Qwen3-8B/2025-07-24...
-        meta_info = trace_file.replace("\\", "/").split("/")
+        meta_info = game_folder.replace("\\", "/").split("/")
 
-        matchup_str = meta_info[-4]  # "Qwen3-8B v.s. deepseek-chat"
-        p1_model = meta_info[-3]  # "Qwen3-8B" (本次对战的玩家1)
+        matchup_str = meta_info[-3]  # "Qwen3-8B v.s. deepseek-chat"
+        p1_model = meta_info[-2]  # "Qwen3-8B" (本次对战的玩家1)
 
         # 从对战组合中找出玩家2
         all_models_in_matchup = matchup_str.split(" v.s. ")
@@ -63,7 +70,7 @@ for trace_file in trace_files:
         p2_model_list = [m for m in all_models_in_matchup if m != p1_model]
         if not p2_model_list:
             print(
-                f"警告: 无法在 '{matchup_str}' 中为玩家 '{p1_model}' 找到对手。跳过文件: {trace_file}"
+                f"警告: 无法在 '{matchup_str}' 中为玩家 '{p1_model}' 找到对手。跳过文件: {game_folder}"
             )
             continue
         p2_model = p2_model_list[0]
@@ -78,18 +85,8 @@ for trace_file in trace_files:
         p2_elo = elo_scores[p2_model]
 
         # 读取比赛结果
-        with open(trace_file, "r", encoding="utf-8") as f:
-            # 为了效率，可以逐行读取，而不是一次性读入整个可能很大的JSON文件
-            score_p1 = None
-            for line in f:
-                if '"game_result"' in line:
-                    if '"Victory"' in line:
-                        score_p1 = 1.0
-                    elif '"Tie"' in line:
-                        score_p1 = 0.5
-                    elif '"Defeat"' in line:
-                        score_p1 = 0.0
-                    break  # 找到结果后即可退出
+        game_result = results[game_folder]["result"]
+        score_p1 = {"Victory": 1.0, "Tie": 0.5, "Defeat": 0.0}.get(game_result)
 
         # 如果找到了比赛结果，则更新ELO分数
         if score_p1 is not None:
@@ -97,10 +94,10 @@ for trace_file in trace_files:
             elo_scores[p1_model] = new_p1_elo
             elo_scores[p2_model] = new_p2_elo
         else:
-            print(f"警告: 在文件 {trace_file} 中未找到有效的 'game_result'。")
+            print(f"警告: 在文件 {game_folder} 中未找到有效的 'game_result'。")
 
     except (IndexError, FileNotFoundError) as e:
-        print(f"错误: 解析文件路径 '{trace_file}' 时出错: {e}。跳过。")
+        print(f"错误: 解析文件路径 '{game_folder}' 时出错: {e}。跳过。")
 
 
 # --- 结果报告 ---
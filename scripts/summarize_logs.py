@@ -1,10 +1,14 @@
 import glob
 import os
 import shutil
+import sys
 from tabulate import tabulate
 
 from argparse import ArgumentParser
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.results import ResultIndex
+
 parser = ArgumentParser()
 parser.add_argument("--delete_unfinished", action="store_true", help="Delete unfinished folders")
 parser.add_argument("--delete_failed", action="store_true", help="Delete failed folders")
@@ -14,6 +18,7 @@ folders = glob.glob("logs/*_benchmark/*/*/*")
 folders = sorted(folders)
 
 res = {}
+index = ResultIndex()
 
 for folder in folders:
     keys = folder.split("/")
@@ -21,23 +26,23 @@ for folder in folders:
     if folder_key not in res:
         res[folder_key] = [0, 0]  # win count, loss count
 
-    if not os.path.isfile(folder + "/replay.SC2Replay") or not os.path.isfile(
-        folder + "/trace.json"
-    ):
+    result = index.get(folder)
+    if not os.path.isfile(folder + "/replay.SC2Replay") or result is None:
         if args.delete_unfinished:
             print(f"Deleting unfinished folder: {folder}")
             shutil.rmtree(folder)
+            index.remove(folder)
         continue
-    trace_file = os.path.join(folder, "trace.json")
-    with open(trace_file, "r", encoding="utf-8") as f:
-        trace_data = f.read()
-    if "Defeat" not in trace_data:
+    if result["result"] != "Defeat":
         res[folder_key][0] += 1
     else:
         res[folder_key][1] += 1
         if args.delete_failed:
             print(f"Deleting failed folder: {folder}")
             shutil.rmtree(folder)
+            index.remove(folder)
+
+index.save()
 
 headers = ["Player", "Wins", "Losses", "Total"]
 table_data = []
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import zlib
+
+PACK_FILE = "blobs.pack"
+INDEX_FILE = "blobs.idx"
+BLOB_KEY = "$blob"
+
+
+class BlobStore:
+    """Content-addressed store for the large strings of a game's logs.
+
+    A string of at least ``min_size`` characters is split into paragraphs
+    ("\\n\\n"); each paragraph of at least ``min_size`` characters is stored
+    once, zlib-compressed, in ``blobs.pack`` under a hash of its content, and
+    runs of shorter paragraphs stay inline. In its place the trace keeps
+    ``{"$blob": [[hash], "inline text", ...]}``, whose parts are joined with
+    "\\n\\n" again; a ``[hash, skip]`` part stands for the blob text without
+    its first ``skip`` characters. The static rules / examples of every prompt
+    are thus stored once. ``intern_section`` stores a section value as the
+    paragraph its heading would make of it in a prompt ("# Key\\nvalue"), so
+    observation sections share their blobs with the prompts embedding them.
+    ``blobs.idx`` holds one ``hash offset length`` line per blob.
+    """
+
+    def __init__(self, root: str, min_size: int = 256, level: int = 6):
+        self.root = root
+        self.min_size = min_size
+        self.level = level
+        self.pack_path = os.path.join(root, PACK_FILE)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.index = self._load_index(self.index_path)
+        self._pack = None
+        self._index_file = None
+        self._reader = None
+
+    @staticmethod
+    def _load_index(path: str) -> dict:
+        index = {}
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3:
+                        index[parts[0]] = (int(parts[1]), int(parts[2]))
+        return index
+
+    @staticmethod
+    def digest(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+    def put(self, text: str) -> str:
+        key = self.digest(text)
+        if key not in self.index:
+            if self._pack is None:
+                self._pack = open(self.pack_path, "ab")
+                self._index_file = open(self.index_path, "a", encoding="utf-8")
+            data = zlib.compress(text.encode("utf-8"), self.level)
+            offset = self._pack.seek(0, os.SEEK_END)
+            self._pack.write(data)
+            self.index[key] = (offset, len(data))
+            self._index_file.write(f"{key} {offset} {len(data)}\n")
+        return key
+
+    def get(self, key: str) -> str:
+        offset, length = self.index[key]
+        if self._pack is not None:
+            self._pack.flush()
+        if self._reader is None:
+            self._reader = open(self.pack_path, "rb")
+        self._reader.seek(offset)
+        return zlib.decompress(self._reader.read(length)).decode("utf-8")
+
+    def _parts(self, text: str) -> list:
+        parts, inline = [], []
+        for paragraph in text.split("\n\n"):
+            if len(paragraph) < self.min_size:
+                inline.append(paragraph)
+                continue
+            if inline:
+                parts.append("\n\n".join(inline))
+                inline = []
+            parts.append([self.put(paragraph)])
+        if inline:
+            parts.append("\n\n".join(inline))
+        return parts
+
+    def intern(self, value):
+        """Copy of ``value`` with every large string replaced by a blob reference."""
+        if isinstance(value, str):
+            if len(value) < self.min_size:
+                return value
+            parts = self._parts(value)
+            if all(isinstance(part, str) for part in parts):
+                return value
+            return {BLOB_KEY: parts}
+        if isinstance(value, dict):
+            return {k: self.intern(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.intern(v) for v in value]
+        return value
+
+    def intern_section(self, heading: str, text: str):
+        """Like ``intern``, but blobs are cut from ``heading + text``, as the text appears in prompts."""
+        full = heading + text
+        if len(full) < self.min_size:
+            return text
+        parts = self._parts(full)
+        if all(isinstance(part, str) for part in parts):
+            return text
+        first = parts[0]
+        parts[0] = first[len(heading):] if isinstance(first, str) else [first[0], len(heading)]
+        return {BLOB_KEY: parts}
+
+    def _part_text(self, part) -> str:
+        if isinstance(part, str):
+            return part
+        text = self.get(part[0])
+        return text[part[1]:] if len(part) > 1 else text
+
+    def rehydrate(self, value):
+        """Inverse of ``intern``."""
+        if isinstance(value, dict):
+            if len(value) == 1 and BLOB_KEY in value:
+                return "\n\n".join(self._part_text(part) for part in value[BLOB_KEY])
+            return {k: self.rehydrate(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.rehydrate(v) for v in value]
+        return value
+
+    def sizes(self) -> tuple:
+        """Current (pack, index) file sizes in bytes, as recorded in a trace manifest."""
+        return tuple(os.path.getsize(p) if os.path.isfile(p) else 0 for p in (self.pack_path, self.index_path))
+
+    def flush(self, fsync: bool = False):
+        for f in (self._pack, self._index_file):
+            if f is not None:
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+
+    def close(self):
+        self.flush(fsync=True)
+        for f in (self._pack, self._index_file, self._reader):
+            if f is not None:
+                f.close()
+        self._pack = self._index_file = self._reader = None
+
+
+def open_blob_store(folder: str):
+    """BlobStore of a game folder for reading, or None if the game has no blobs."""
+    if not os.path.isfile(os.path.join(folder, INDEX_FILE)):
+        return None
+    return BlobStore(folder)
@@ -17,6 +17,15 @@ def extract_code(text):
     return ""
 
 
+def obs_section_heading(key: str) -> str:
+    return f"# {key}\n"
+
+
+def construct_obs_text(obs: dict) -> str:
+    """Observation text: one "# Key\\nvalue" paragraph per section (embedded as is in the prompts)."""
+    return "\n\n".join([obs_section_heading(key) + value for key, value in obs.items()])
+
+
 def json_to_markdown(content, language=""):
     if isinstance(content, str):
         content = json.loads(content)
@@ -13,6 +13,15 @@ class LLMClient:
             base_url=base_url,
             api_key=api_key,
         )
+        # call statistics, reported in result.json
+        self.stats = {
+            "calls": 0,
+            "failed_attempts": 0,
+            "fallbacks": 0,
+            "latency_seconds": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
 
     def call(
         self,
@@ -54,11 +63,18 @@ class LLMClient:
             )
 
             response = completion.choices[0].message.content.strip()
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                self.stats["prompt_tokens"] += usage.prompt_tokens or 0
+                self.stats["completion_tokens"] += usage.completion_tokens or 0
             return response
 
+        self.stats["calls"] += 1
         for _ in range(retry_times):
             try:
+                start_time = time.time()
                 response = call_thread()
+                self.stats["latency_seconds"] += time.time() - start_time
                 if need_json:
                     resp_json = json.loads(extract_code(response))
                     assert isinstance(resp_json, dict) or isinstance(
@@ -67,11 +83,13 @@ class LLMClient:
                 messages.append({"role": "assistant", "content": response})
                 return response, messages
             except Exception as e:
+                self.stats["failed_attempts"] += 1
                 print("Error while calling LLM service:", e)
                 # import pdb; pdb.set_trace()
                 time.sleep(retry_interval)
                 continue
 
+        self.stats["fallbacks"] += 1
         response = "```\n[]\n```"
         messages.append({"role": "assistant", "content": response})
         return response, messages
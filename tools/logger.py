@@ -1,9 +1,21 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 from typing import Optional
 from datetime import datetime
 
+# "sync": handlers run inside the logging call (default)
+# "async": records go through a QueueHandler to a listener thread that formats and writes them
+# "quiet": async, no console output, and print() is routed into the logger (for many parallel benchmark games)
+LOGGING_PROFILES = ["sync", "async", "quiet"]
+
+_listeners = []
+# loggers configured by setup_logger, with the handlers behind them (closed by stop_logging)
+_configured = []
+
 
 class ColoredFormatter(logging.Formatter):
     COLORS = {
@@ -25,6 +37,7 @@ def setup_logger(
     name: str,
     level: int = logging.INFO,
     log_dir: Optional[str] = None,
+    profile: str = "sync",
 ) -> logging.Logger:
     logger = logging.getLogger(name)
     logger.setLevel(level)
@@ -38,11 +51,14 @@ def setup_logger(
     file_formatter = logging.Formatter(**format_config)
 
     if not logger.hasHandlers():
+        handlers = []
+
         # Stream Handler
-        s_handler = logging.StreamHandler(stream=sys.stdout)
-        s_handler.setFormatter(stream_formatter)
-        s_handler.setLevel(level)
-        logger.addHandler(s_handler)
+        if profile != "quiet":
+            s_handler = logging.StreamHandler(stream=sys.stdout)
+            s_handler.setFormatter(stream_formatter)
+            s_handler.setLevel(level)
+            handlers.append(s_handler)
 
         # File Handler
         if log_dir is None:
@@ -53,13 +69,79 @@ def setup_logger(
             f_handler = logging.FileHandler(log_file, "a")
             f_handler.setFormatter(file_formatter)
             f_handler.setLevel(level)
-            logger.addHandler(f_handler)
+            handlers.append(f_handler)
         except OSError as e:
-            logger.error(f"Failed to create log file: {e}")
+            print(f"Failed to create log file: {e}", file=sys.stderr)
+
+        _configured.append((logger, handlers))
+        if profile == "sync":
+            for handler in handlers:
+                logger.addHandler(handler)
+        else:
+            # the caller only enqueues the record; formatting and I/O happen on the listener thread
+            log_queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+            logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            logger.propagate = False
+
+    if profile == "quiet":
+        route_print(logger)
 
     return logger
 
 
+class PrintToLogger:
+    """File-like object that forwards complete lines written to it to a logger."""
+
+    def __init__(self, logger: logging.Logger, level: int = logging.INFO):
+        self.logger = logger
+        self.level = level
+        self._buffer = ""
+
+    def write(self, text: str):
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            if line.strip():
+                self.logger.log(self.level, line)
+        return len(text)
+
+    def flush(self):
+        if self._buffer.strip():
+            self.logger.log(self.level, self._buffer)
+        self._buffer = ""
+
+    def isatty(self):
+        return False
+
+
+def route_print(logger: logging.Logger):
+    """Send print() output (sys.stdout) to ``logger``; the first logger routed to keeps it."""
+    if not isinstance(sys.stdout, PrintToLogger):
+        sys.stdout = PrintToLogger(logger)
+
+
+def stop_logging():
+    """Flush and stop the listener threads of async loggers, then close every handler (log files included)."""
+    if isinstance(sys.stdout, PrintToLogger):
+        sys.stdout.flush()
+        sys.stdout = sys.__stdout__
+    while _listeners:
+        _listeners.pop().stop()
+    while _configured:
+        logger, handlers = _configured.pop()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        for handler in handlers:
+            handler.close()
+
+
+atexit.register(stop_logging)
+
+
 def test_setup_logger():
     logger = setup_logger("my_logger", logging.DEBUG, "./my_logs")
     logger.debug("This is a DEBUG message.")
@@ -0,0 +1,129 @@
+import json
+import os
+
+import numpy as np
+
+# Per-step metrics written by LLMPlayer.log_current_iteration as one trace record.
+METRIC_KEYS = [
+    "iteration",
+    "time_seconds",
+    "minerals",
+    "vespene",
+    "unit_mineral_value",
+    "unit_vespene_value",
+    "structure_mineral_value",
+    "structure_vespene_value",
+    "supply_army",
+    "supply_workers",
+    "supply_left",
+    "n_structures",
+    "n_visible_enemy_units",
+    "n_visible_enemy_structures",
+    "n_unit_types",
+    "n_structure_types",
+]
+
+# Metrics whose growth is used as the reward of a decision step.
+VALUE_KEYS = [
+    "unit_mineral_value",
+    "unit_vespene_value",
+    "structure_mineral_value",
+    "structure_vespene_value",
+    "supply_army",
+    "supply_workers",
+]
+
+
+def value_snapshot(step: dict) -> dict:
+    """Extract the value metrics (and iteration) from one trace step."""
+    return {key: step[key] for key in ["iteration"] + VALUE_KEYS}
+
+
+METRICS_FILE = "metrics.npz"
+METRICS_ROWS_FILE = "metrics.rows"
+
+
+class MetricsSink:
+    """Per-game metrics in a fixed-schema columnar file (one float64 column per METRIC_KEYS key).
+
+    While the game runs, rows are appended as raw float64 values to
+    ``metrics.rows`` (a JSON line with the keys, then the rows) every
+    ``flush_every`` rows, so write cost stays linear in game length and a
+    crashed game still leaves its metrics up to the last flush. ``close``
+    converts the rows file into ``metrics.npz``. Missing keys are stored as NaN.
+    """
+
+    def __init__(self, path: str, keys: list = METRIC_KEYS, flush_every: int = 50):
+        self.path = path
+        self.rows_path = os.path.join(os.path.dirname(path) or ".", METRICS_ROWS_FILE)
+        self.keys = list(keys)
+        self.flush_every = flush_every
+        self.rows = []  # rows not yet flushed
+
+    def append(self, snapshot: dict):
+        self.rows.append([snapshot.get(key, np.nan) for key in self.keys])
+        if len(self.rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        new_file = not os.path.isfile(self.rows_path)
+        with open(self.rows_path, "ab") as f:
+            if new_file:
+                f.write((json.dumps(self.keys) + "\n").encode("utf-8"))
+            f.write(np.array(self.rows, dtype=np.float64).tobytes())
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        columns = read_metric_rows(self.rows_path) if os.path.isfile(self.rows_path) else {key: np.zeros(0) for key in self.keys}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **columns)
+        os.replace(tmp_path, self.path)
+        if os.path.isfile(self.rows_path):
+            os.remove(self.rows_path)
+
+
+def read_metric_rows(path: str) -> dict:
+    """Columns of a ``metrics.rows`` file (a torn last row is dropped)."""
+    with open(path, "rb") as f:
+        keys = json.loads(f.readline())
+        data = f.read()
+    n = len(data) // (8 * len(keys))
+    rows = np.frombuffer(data[: n * 8 * len(keys)], dtype=np.float64).reshape(n, len(keys))
+    return {key: rows[:, i].copy() for i, key in enumerate(keys)}
+
+
+def load_metrics(folder: str, keys: list = METRIC_KEYS) -> dict:
+    """Metric columns of a game: metrics.npz, metrics.rows of a crashed game, or the trace of older games."""
+    path = os.path.join(folder, METRICS_FILE)
+    rows_path = os.path.join(folder, METRICS_ROWS_FILE)
+    if os.path.isfile(path) or os.path.isfile(rows_path):
+        if os.path.isfile(path):
+            with np.load(path) as npz:
+                data = {key: npz[key] for key in npz.files}
+        else:
+            data = read_metric_rows(rows_path)
+        n = len(next(iter(data.values()))) if data else 0
+        return {key: data[key] if key in data else np.full(n, np.nan) for key in keys}
+    from tools.trace_io import read_trace
+
+    steps = [step for step in read_trace(folder).values() if "iteration" in step]
+    return {key: np.array([step.get(key, np.nan) for step in steps], dtype=np.float64) for key in keys}
+
+
+def consolidate_metrics(folders: list, keys: list = METRIC_KEYS) -> dict:
+    """Concatenate the metric columns of many games; ``game`` indexes into the returned ``folders``."""
+    columns = {key: [] for key in keys}
+    game = []
+    for i, folder in enumerate(folders):
+        metrics = load_metrics(folder, keys)
+        for key in keys:
+            columns[key].append(metrics[key])
+        game.append(np.full(len(metrics[keys[0]]), i, dtype=np.int32))
+    merged = {key: np.concatenate(values) if values else np.zeros(0) for key, values in columns.items()}
+    merged["game"] = np.concatenate(game) if game else np.zeros(0, dtype=np.int32)
+    merged["folders"] = np.array(folders, dtype=str)
+    return merged
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import zlib
+from urllib.parse import quote
+
+from tools.format import construct_obs_text
+from tools.trace_io import read_trace
+
+ARCHIVE_FILE = "observation.sqlite"
+
+
+class ObservationArchive:
+    """All saved observations of one game in a single sqlite file.
+
+    Replaces the ``observation/{idx}-{key}.txt`` files: one row per (idx, key)
+    with the zlib-compressed text, so a game is one file on the logs volume and
+    any observation can be read back by idx. Writes are committed every
+    ``commit_every`` puts, and on ``close``. The rollback journal (TRUNCATE) is
+    used rather than WAL, which needs shared memory that network filesystems
+    such as the NFS logs volume do not provide. ``readonly`` opens an existing
+    archive without touching it (``mode=ro``).
+    """
+
+    def __init__(self, path: str, commit_every: int = 20, level: int = 6, readonly: bool = False):
+        self.path = path
+        self.commit_every = commit_every
+        self.level = level
+        self.readonly = readonly
+        self._pending = 0
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+            return
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=TRUNCATE")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS observation (idx INTEGER NOT NULL, key TEXT NOT NULL, data BLOB NOT NULL, PRIMARY KEY (idx, key))"
+        )
+
+    def put(self, idx: int, key: str, text: str):
+        data = zlib.compress(text.encode("utf-8"), self.level)
+        self.conn.execute("INSERT OR REPLACE INTO observation (idx, key, data) VALUES (?, ?, ?)", (idx, key, data))
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def get(self, idx: int, key: str):
+        row = self.conn.execute("SELECT data FROM observation WHERE idx = ? AND key = ?", (idx, key)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def entries(self, key: str = None) -> list:
+        """Sorted (idx, key) pairs, optionally of one key."""
+        if key is None:
+            rows = self.conn.execute("SELECT idx, key FROM observation ORDER BY idx, key")
+        else:
+            rows = self.conn.execute("SELECT idx, key FROM observation WHERE key = ? ORDER BY idx", (key,))
+        return rows.fetchall()
+
+    def commit(self):
+        if not self.readonly:
+            self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        if self.conn is not None:
+            self.commit()
+            self.conn.close()
+            self.conn = None
+
+
+def read_obs_text(folder: str, idx: int):
+    """obs_text of step ``idx``, rebuilt from the trace's obs sections (it is not archived separately)."""
+    obs = read_trace(folder).get(str(idx), {}).get("obs")
+    return construct_obs_text(obs) if obs is not None else None
+
+
+def open_archive(path: str) -> ObservationArchive:
+    """Archive of a game folder (or an archive file path), opened read-only."""
+    if os.path.isdir(path):
+        path = os.path.join(path, ARCHIVE_FILE)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    return ObservationArchive(path, readonly=True)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="List or extract observations of a game.")
+    parser.add_argument("path", help="game log folder or observation.sqlite")
+    parser.add_argument("--idx", type=int, default=None, help="step to extract (default: list entries); obs_text is rebuilt from the trace")
+    parser.add_argument("--key", default="obs_text")
+    parser.add_argument("-o", "--output", default=None, help="write to a file instead of stdout")
+    args = parser.parse_args()
+
+    archive = open_archive(args.path)
+    if args.idx is None:
+        for idx, key in archive.entries():
+            print(f"{idx}\t{key}")
+    else:
+        text = archive.get(args.idx, args.key)
+        if text is None and args.key == "obs_text" and os.path.isdir(args.path):
+            text = read_obs_text(args.path, args.idx)
+        if text is None:
+            raise SystemExit(f"No observation {args.idx}-{args.key}")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            print(text)
+    archive.close()
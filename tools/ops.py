@@ -1,3 +1,6 @@
+from collections import deque
+
+
 class IterativeMean:
     def __init__(self):
         self.mean = 0
@@ -7,3 +10,74 @@ class IterativeMean:
         self.count += 1
         self.mean = self.mean + (new_value - self.mean) / self.count
         return self.mean
+
+
+class TagIdAllocator:
+    """Bidirectional mapping between SC2 unit tags and short integer ids.
+
+    An id prefers ``tag % capacity`` so that a unit re-allocated after being
+    released usually gets its old id back; otherwise any id is taken from the
+    free-list. A released id is held back for ``hold_cycles`` cycles
+    (``next_cycle``, called once per step) before it can be reused, so an
+    action that still names the old id cannot reach a different unit. The id
+    space doubles when it is exhausted, so allocation, release and lookups are
+    all O(1). ``stale_tags`` finds tags that are no longer in the game (enemies
+    dying out of vision, replaced snapshot resources), so they can be released.
+    """
+
+    def __init__(self, capacity: int = 1000, hold_cycles: int = 2):
+        self.capacity = capacity
+        self.hold_cycles = hold_cycles
+        self.tag_to_id = {}
+        self.id_to_tag = {}
+        self._free = set(range(capacity))
+        self._held = deque()  # (cycle released, id)
+        self.cycle = 0
+        self._misses = {}  # tag -> consecutive sweeps it was missing from
+
+    def __len__(self):
+        return len(self.tag_to_id)
+
+    def has_id(self, _id) -> bool:
+        return _id in self.id_to_tag
+
+    def allocate(self, tag: int) -> int:
+        _id = self.tag_to_id.get(tag)
+        if _id is not None:
+            return _id
+        if not self._free:
+            self._free.update(range(self.capacity, self.capacity * 2))
+            self.capacity *= 2
+        _id = tag % self.capacity
+        if _id in self._free:
+            self._free.remove(_id)
+        else:
+            _id = self._free.pop()
+        self.tag_to_id[tag] = _id
+        self.id_to_tag[_id] = tag
+        return _id
+
+    def release(self, tag: int):
+        """Free the id of ``tag`` (after the hold period); returns the released id or None if unknown."""
+        _id = self.tag_to_id.pop(tag, None)
+        if _id is None:
+            return None
+        del self.id_to_tag[_id]
+        self._misses.pop(tag, None)
+        self._held.append((self.cycle, _id))
+        return _id
+
+    def next_cycle(self):
+        """Start a new decision cycle; ids held for ``hold_cycles`` cycles become reusable."""
+        self.cycle += 1
+        while self._held and self.cycle - self._held[0][0] >= self.hold_cycles:
+            self._free.add(self._held.popleft()[1])
+
+    def stale_tags(self, present, max_misses: int) -> list:
+        """Tags missing from ``present`` (a set of live tags) at ``max_misses`` consecutive calls."""
+        misses = {}
+        for tag in self.tag_to_id:
+            if tag not in present:
+                misses[tag] = self._misses.get(tag, 0) + 1
+        self._misses = misses
+        return [tag for tag, count in misses.items() if count >= max_misses]
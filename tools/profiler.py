@@ -0,0 +1,166 @@
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+
+class Histogram:
+    """Fixed-size histogram of durations (seconds) with log-spaced bins from 10us to 100s."""
+
+    EDGES = np.logspace(-5, 2, 71)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.EDGES) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.counts[np.searchsorted(self.EDGES, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Upper edge of the bin holding the q-th percentile, capped by the max."""
+        if not self.count:
+            return 0.0
+        rank = np.searchsorted(np.cumsum(self.counts), q / 100 * self.count)
+        upper = self.EDGES[min(rank, len(self.EDGES) - 1)]
+        return float(min(upper, self.max))
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total * 1000 / max(self.count, 1), 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class StackSampler(threading.Thread):
+    """Daemon thread sampling the stack of one thread every ``interval`` seconds while active."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005, depth: int = 12):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.depth = depth
+        self.samples = Counter()
+        self._active = threading.Event()
+        # guards self.samples: a sample taken while stopping must not land in the returned Counter
+        self._lock = threading.Lock()
+
+    def start_sampling(self):
+        with self._lock:
+            self.samples = Counter()
+        self._active.set()
+
+    def stop_sampling(self) -> Counter:
+        """Stop sampling and hand over the samples of this period (no longer touched by the thread)."""
+        self._active.clear()
+        with self._lock:
+            samples, self.samples = self.samples, Counter()
+        return samples
+
+    def run(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or not self._active.is_set():
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.depth:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            with self._lock:
+                if self._active.is_set():
+                    self.samples[" <- ".join(stack)] += 1
+
+
+class StepProfiler:
+    """Opt-in timing of on_step components.
+
+    ``section(name)`` records wall and CPU time of a block into per-component
+    histograms (managers are timed through the scheduler's ``profiler`` hook,
+    obs_to_text parts and agent calls through sections). ``step(iteration)`` times a whole
+    step; with ``slow_step_threshold`` set, the stack of the stepping thread is
+    sampled during each step and kept for steps slower than the threshold.
+    When disabled every hook is a no-op.
+    """
+
+    def __init__(self, enabled: bool = False, slow_step_threshold: float = None, max_slow_steps: int = 50):
+        self.enabled = enabled
+        self.slow_step_threshold = slow_step_threshold
+        self.max_slow_steps = max_slow_steps
+        self.wall = {}
+        self.cpu = {}
+        self.slow_steps = []
+        self._sampler = None
+
+    def record(self, name: str, wall: float, cpu: float):
+        if name not in self.wall:
+            self.wall[name] = Histogram()
+            self.cpu[name] = Histogram()
+        self.wall[name].add(wall)
+        self.cpu[name].add(cpu)
+
+    @contextmanager
+    def _timed(self, name: str):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def section(self, name: str):
+        return self._timed(name) if self.enabled else nullcontext()
+
+    @contextmanager
+    def step(self, iteration: int):
+        if not self.enabled:
+            yield
+            return
+        sampling = self.slow_step_threshold is not None
+        if sampling:
+            if self._sampler is None:
+                self._sampler = StackSampler(threading.get_ident())
+                self._sampler.start()
+            self._sampler.start_sampling()
+        wall_start = time.perf_counter()
+        try:
+            with self._timed("on_step"):
+                yield
+        finally:
+            elapsed = time.perf_counter() - wall_start
+            if sampling:
+                samples = self._sampler.stop_sampling()
+                if elapsed > self.slow_step_threshold and len(self.slow_steps) < self.max_slow_steps:
+                    self.slow_steps.append({
+                        "iteration": iteration,
+                        "wall_ms": round(elapsed * 1000, 2),
+                        "stacks": dict(samples.most_common(10)),
+                    })
+
+    def summary(self) -> dict:
+        return {
+            name: {"wall": self.wall[name].summary(), "cpu": self.cpu[name].summary()}
+            for name in sorted(self.wall)
+        }
+
+    def dump(self, log_path: str):
+        """Write profile.json (and slow_steps.json when sampling) into the game log folder."""
+        if not self.enabled:
+            return
+        with open(f"{log_path}/profile.json", "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+        if self.slow_step_threshold is not None:
+            with open(f"{log_path}/slow_steps.json", "w", encoding="utf-8") as f:
+                json.dump(self.slow_steps, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,125 @@
+import json
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from tools.trace_io import trace_path, trace_finished, read_game_result
+
+RESULT_FILE = "result.json"
+INDEX_PATH = "logs/results_index.json"
+
+
+def write_json_atomic(data, path: str):
+    """Write ``path`` through a temporary file and a rename, so readers never see half a file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_result(folder: str, record: dict):
+    write_json_atomic(record, os.path.join(folder, RESULT_FILE))
+
+
+def read_result(folder: str):
+    """The result record of a game folder, None while the game is unfinished.
+
+    Games logged before result.json existed get ``{"result": ...}`` from their trace.
+    """
+    path = os.path.join(folder, RESULT_FILE)
+    if os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    if trace_path(folder) is not None and trace_finished(folder):
+        return {"result": read_game_result(folder)}
+    return None
+
+
+@contextmanager
+def _locked(path: str):
+    """Exclusive lock on ``{path}.lock`` across processes (no-op where fcntl is unavailable)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class ResultIndex:
+    """Results of finished games by folder, cached in one JSON file.
+
+    Finished games never change, so a folder's record is read (result.json, or
+    the trace for old games) the first time it is seen and then served from
+    the index. Unfinished games are not cached.
+
+    Many game processes share the index, so this object only records its own
+    changes; ``save`` takes a file lock, re-reads the index, applies the
+    changes (skipping additions of folders deleted meanwhile) and rewrites it
+    atomically.
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self.records = self._read()
+        self._changes = {}  # key -> record, or None for a removal
+
+    def _read(self) -> dict:
+        if not os.path.isfile(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def key(folder: str) -> str:
+        return os.path.normpath(folder).replace("\\", "/")
+
+    def get(self, folder: str):
+        key = self.key(folder)
+        if key not in self.records:
+            record = read_result(folder)
+            if record is None:
+                return None
+            self.set(folder, record)
+        return self.records[key]
+
+    def set(self, folder: str, record: dict):
+        key = self.key(folder)
+        self.records[key] = record
+        self._changes[key] = record
+
+    def remove(self, folder: str):
+        key = self.key(folder)
+        self.records.pop(key, None)
+        self._changes[key] = None
+
+    def save(self):
+        if not self._changes:
+            return
+        with _locked(self.path):
+            records = self._read()
+            for key, record in self._changes.items():
+                if record is None:
+                    records.pop(key, None)
+                elif os.path.isdir(key):
+                    records[key] = record
+            write_json_atomic(records, self.path)
+        self.records = records
+        self._changes = {}
+
+
+def load_results(folders, index_path: str = INDEX_PATH) -> dict:
+    """{folder: result record or None} for ``folders``, through (and updating) the shared index."""
+    index = ResultIndex(index_path)
+    results = {folder: index.get(folder) for folder in folders}
+    index.save()
+    return results
@@ -0,0 +1,191 @@
+import os
+import shutil
+import tarfile
+import time
+
+from tools.results import RESULT_FILE, INDEX_PATH, ResultIndex, read_result
+from tools.trace_io import read_manifest
+
+ARCHIVE_NAME = "game.tar.gz"
+# kept next to the archive: opened directly by SC2 / the report scripts
+KEEP_FILES = {"replay.SC2Replay", RESULT_FILE, "config.json", "config_1.json", "config_2.json", "metrics.npz", ARCHIVE_NAME}
+# game folders are named by their start time (BasePlayer)
+FOLDER_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+def scan_folder(folder: str):
+    """(total bytes, newest file mtime) of ``folder``; the folder's own mtime if it has no files."""
+    total, latest = 0, None
+    for dirpath, _, filenames in os.walk(folder):
+        for name in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            total += stat.st_size
+            latest = stat.st_mtime if latest is None else max(latest, stat.st_mtime)
+    return total, latest if latest is not None else os.path.getmtime(folder)
+
+
+def folder_size(folder: str) -> int:
+    return scan_folder(folder)[0]
+
+
+def is_finished(folder: str, index: ResultIndex) -> bool:
+    """Cheap finished check: indexed, has result.json, or its trace manifest says so (no trace parsing)."""
+    if index.key(folder) in index.records or os.path.isfile(os.path.join(folder, RESULT_FILE)):
+        return True
+    manifest = read_manifest(folder)
+    return manifest is not None and manifest["finished"]
+
+
+def cached_size(folder: str, index: ResultIndex) -> int:
+    """Size of a finished game, kept in its index record (``folder_bytes``) once measured."""
+    record = index.get(folder)
+    if record is not None and "folder_bytes" in record:
+        return record["folder_bytes"]
+    size = folder_size(folder)
+    if record is not None:
+        index.set(folder, dict(record, folder_bytes=size))
+    return size
+
+
+def game_time(folder: str) -> float:
+    """Start time of a game, from its folder name; falls back to the oldest config/result mtime.
+
+    Folder mtimes are no use for ordering: compressing a game rewrites its folder.
+    """
+    try:
+        return time.mktime(time.strptime(os.path.basename(os.path.normpath(folder)), FOLDER_TIME_FORMAT))
+    except ValueError:
+        pass
+    times = [os.path.getmtime(os.path.join(folder, name)) for name in ("config.json", "config_1.json", RESULT_FILE) if os.path.isfile(os.path.join(folder, name))]
+    return min(times) if times else os.path.getmtime(folder)
+
+
+def find_game_folders(root: str) -> list:
+    """Game log folders under ``root`` (folders holding a config, trace or result file)."""
+    markers = {RESULT_FILE, "config.json", "config_1.json", "trace.jsonl", "trace.json", ARCHIVE_NAME}
+    folders = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if markers & set(filenames):
+            folders.append(dirpath)
+            dirnames[:] = []
+    return sorted(folders)
+
+
+def is_compressed(folder: str) -> bool:
+    return os.path.isfile(os.path.join(folder, ARCHIVE_NAME))
+
+
+def compress_game(folder: str) -> bool:
+    """Pack everything but KEEP_FILES of a finished game into game.tar.gz; False if skipped."""
+    if is_compressed(folder) or read_result(folder) is None:
+        return False
+    names = sorted(name for name in os.listdir(folder) if name not in KEEP_FILES)
+    if not names:
+        return False
+    tmp_path = os.path.join(folder, ARCHIVE_NAME + ".tmp")
+    with tarfile.open(tmp_path, "w:gz") as tar:
+        for name in names:
+            tar.add(os.path.join(folder, name), arcname=name)
+    os.replace(tmp_path, os.path.join(folder, ARCHIVE_NAME))
+    for name in names:
+        path = os.path.join(folder, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    return True
+
+
+def extract_game(folder: str) -> bool:
+    """Restore the files of a compressed game folder and drop the archive."""
+    path = os.path.join(folder, ARCHIVE_NAME)
+    if not os.path.isfile(path):
+        return False
+    with tarfile.open(path, "r:gz") as tar:
+        tar.extractall(folder)
+    os.remove(path)
+    return True
+
+
+def enforce_quota(root: str, max_bytes: int, index: ResultIndex, stale_hours: float = 24) -> list:
+    """Delete the oldest games under ``root`` (by start time) until it fits in ``max_bytes``.
+
+    Finished games can always be deleted; their sizes come from the index.
+    Unfinished games are only deleted once nothing in them changed for
+    ``stale_hours`` (crashed runs); newer ones may still be running and are
+    counted but kept. Deleted folders are removed from ``index``. Returns the
+    deleted folders.
+    """
+    cutoff = time.time() - stale_hours * 3600
+    sizes, candidates = {}, []
+    for folder in find_game_folders(root):
+        if is_finished(folder, index):
+            sizes[folder] = cached_size(folder, index)
+            candidates.append(folder)
+        else:
+            sizes[folder], latest = scan_folder(folder)
+            if latest < cutoff:
+                candidates.append(folder)
+    total = sum(sizes.values())
+    evicted = []
+    for folder in sorted(candidates, key=game_time):
+        if total <= max_bytes:
+            break
+        # another game process may be evicting the same folder
+        shutil.rmtree(folder, ignore_errors=True)
+        index.remove(folder)
+        total -= sizes[folder]
+        evicted.append(folder)
+    return evicted
+
+
+def apply_retention(
+    root: str, compress: bool = True, max_bytes: int = None, index_path: str = INDEX_PATH, folders: list = None, stale_hours: float = 24
+):
+    """Compress finished games (``folders``, default all under ``root``) and enforce the quota, keeping the index in sync."""
+    index = ResultIndex(index_path)
+    compressed = []
+    if compress:
+        for folder in folders if folders is not None else find_game_folders(root):
+            # index the result before packing, so the index never points at a missing record
+            record = index.get(folder)
+            if record is not None and compress_game(folder):
+                index.set(folder, dict(record, folder_bytes=folder_size(folder)))
+                compressed.append(folder)
+    evicted = enforce_quota(root, max_bytes, index, stale_hours) if max_bytes is not None else []
+    index.save()
+    return compressed, evicted
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Compress finished game logs and enforce a disk quota.")
+    parser.add_argument("root", nargs="?", default="logs", help="logs root (or a game folder with --extract)")
+    parser.add_argument("--max_gb", type=float, default=None, help="delete the oldest games above this size")
+    parser.add_argument("--stale_hours", type=float, default=24, help="unfinished games untouched this long count as crashed and may be deleted")
+    parser.add_argument("--no_compress", action="store_true")
+    parser.add_argument("--extract", action="store_true", help="restore the files of the game folder given as root")
+    parser.add_argument("--index", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.extract:
+        if extract_game(args.root):
+            index = ResultIndex(args.index)
+            record = index.get(args.root)
+            if record is not None:
+                # the cached size is the compressed one
+                index.set(args.root, {key: value for key, value in record.items() if key != "folder_bytes"})
+                index.save()
+            print("Extracted", args.root)
+        else:
+            print("Nothing to extract", args.root)
+    else:
+        max_bytes = int(args.max_gb * 1024**3) if args.max_gb is not None else None
+        compressed, evicted = apply_retention(args.root, not args.no_compress, max_bytes, args.index, stale_hours=args.stale_hours)
+        print(f"Compressed {len(compressed)} games, deleted {len(evicted)} games")
+        for folder in evicted:
+            print(f"  deleted {folder}")
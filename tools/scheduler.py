@@ -0,0 +1,84 @@
+import time
+from contextlib import nullcontext
+
+
+class ManagedTask:
+    def __init__(self, name, func, period, priority, budget, urgent, max_deferrals):
+        self.name = name
+        self.func = func
+        self.period = period
+        self.priority = priority
+        self.budget = budget
+        self.urgent = urgent
+        self.max_deferrals = max_deferrals
+
+        self.next_due = 0
+        self.deferrals = 0
+        self.cost = 0.0  # moving average of the wall time of one call
+
+        self.calls = 0
+        self.deferred = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def update_cost(self, elapsed: float, alpha: float = 0.2):
+        self.cost = elapsed if not self.calls else (1 - alpha) * self.cost + alpha * elapsed
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+
+class ManagerScheduler:
+    """Runs periodic async managers within a per-step time budget.
+
+    Every manager has a period (in iterations), a priority and a budget (seconds
+    reserved per call). Due managers run by priority while the larger of their
+    budget and measured cost fits into what is left of ``step_budget``; the
+    others are deferred to the next step. A manager whose ``urgent()`` returns
+    True runs this step regardless of period and budget, and a manager deferred
+    ``max_deferrals`` times in a row is no longer deferred. With a ``profiler``
+    (see ``tools.profiler.StepProfiler``) every call is also recorded as a section.
+    """
+
+    def __init__(self, step_budget: float = 0.02, profiler=None):
+        self.step_budget = step_budget
+        self.profiler = profiler
+        self.tasks = []
+
+    def register(self, name, func, period: int = 1, priority: int = 0, budget: float = 0.005, urgent=None, max_deferrals: int = 5):
+        self.tasks.append(ManagedTask(name, func, period, priority, budget, urgent, max_deferrals))
+        self.tasks.sort(key=lambda t: -t.priority)
+
+    async def run(self, iteration: int):
+        spent = 0.0
+        for task in self.tasks:
+            urgent = task.urgent is not None and task.urgent()
+            if not urgent and iteration < task.next_due:
+                continue
+            reserve = max(task.budget, task.cost)
+            if not urgent and task.deferrals < task.max_deferrals and spent > 0 and spent + reserve > self.step_budget:
+                task.deferrals += 1
+                task.deferred += 1
+                continue
+
+            start = time.perf_counter()
+            with self.profiler.section(task.name) if self.profiler else nullcontext():
+                await task.func()
+            elapsed = time.perf_counter() - start
+            spent += elapsed
+            task.update_cost(elapsed)
+            task.deferrals = 0
+            task.next_due = iteration + task.period
+
+    def report(self) -> dict:
+        """{name: {calls, deferred, total_ms, mean_ms, max_ms}} of every manager."""
+        return {
+            task.name: {
+                "calls": task.calls,
+                "deferred": task.deferred,
+                "total_ms": round(task.total_time * 1000, 2),
+                "mean_ms": round(task.total_time * 1000 / max(task.calls, 1), 3),
+                "max_ms": round(task.max_time * 1000, 2),
+            }
+            for task in self.tasks
+        }
@@ -0,0 +1,273 @@
+import json
+import os
+import queue
+import threading
+import time
+
+from tools.blob_store import BlobStore, open_blob_store, PACK_FILE, INDEX_FILE
+from tools.format import obs_section_heading
+
+TRACE_FILE = "trace.jsonl"
+LEGACY_TRACE_FILE = "trace.json"
+MANIFEST_FILE = "trace.manifest.json"
+END_MARKER = "__end__"
+# record keys holding {section: text} dicts that prompts embed under a heading
+SECTION_HEADINGS = {"obs": obs_section_heading}
+_CHECKPOINT = object()
+
+
+class TraceWriter:
+    """Appends one compact JSON line per trace step from a background thread.
+
+    Lines are ``{"idx": idx, "record": {...}}``. The writer thread serializes
+    and writes whatever is queued, flushes after each batch and fsyncs every
+    ``fsync_every`` lines or ``fsync_interval`` seconds. ``close`` writes an
+    end marker, so readers can tell finished games from interrupted ones.
+
+    With ``dedupe`` the large strings of a record (prompts and replies in the
+    chat histories) go to a ``BlobStore`` next to the trace and the line only
+    holds their references; blobs are written before the lines using them. The
+    observation sections (``SECTION_HEADINGS``) are interned in the
+    "# Key\\nvalue" form the prompts embed them in, so they share blobs.
+
+    After every fsync a small manifest (byte sizes of the synced trace and blob
+    files, number of distinct steps, last idx) replaces the previous one by atomic rename.
+    ``checkpoint`` forces an fsync + manifest, e.g. after each decision;
+    ``recover_trace`` cuts the files of a crashed game back to the manifest.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 50, fsync_interval: float = 5.0, dedupe: bool = True):
+        self.path = path
+        self.blobs = BlobStore(os.path.dirname(path) or ".") if dedupe else None
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.manifest_path = os.path.join(os.path.dirname(path) or ".", MANIFEST_FILE)
+        self._queue = queue.Queue()
+        self._closed = False
+        self._indices = set()
+        self._last_idx = None
+        self._thread = threading.Thread(target=self._run, name="TraceWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, idx: int, record: dict):
+        # a copy: the caller keeps filling its dict while the writer thread serializes
+        self._queue.put({"idx": idx, "record": dict(record)})
+
+    def checkpoint(self):
+        """Make everything written so far durable and record it in the manifest (asynchronously)."""
+        self._queue.put(_CHECKPOINT)
+
+    def close(self, final: dict = None):
+        """Queue the end marker (with ``final`` fields), then wait until everything is on disk."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put({END_MARKER: True, **(final or {})})
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        unsynced, last_sync = 0, time.monotonic()
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                batch = [item]
+                while item is not None and not self._queue.empty():
+                    item = self._queue.get()
+                    batch.append(item)
+                done = batch[-1] is None
+                entries = [entry for entry in batch if entry is not None and entry is not _CHECKPOINT]
+                for entry in entries:
+                    if "idx" in entry:
+                        self._indices.add(entry["idx"])
+                        self._last_idx = entry["idx"]
+                if self.blobs is not None:
+                    entries = [self._intern(entry) for entry in entries]
+                sync = (
+                    done
+                    or _CHECKPOINT in batch
+                    or unsynced + len(entries) >= self.fsync_every
+                    or time.monotonic() - last_sync >= self.fsync_interval
+                )
+                if self.blobs is not None:
+                    self.blobs.flush(fsync=sync)
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+                unsynced += len(entries)
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+                    unsynced, last_sync = 0, time.monotonic()
+                    self._write_manifest(f.tell(), finished=done)
+                if done:
+                    if self.blobs is not None:
+                        self.blobs.close()
+                    return
+
+    def _intern(self, entry: dict) -> dict:
+        if "record" not in entry:
+            return self.blobs.intern(entry)
+        record = {}
+        for key, value in entry["record"].items():
+            heading = SECTION_HEADINGS.get(key)
+            if heading is not None and isinstance(value, dict):
+                record[key] = {
+                    name: self.blobs.intern_section(heading(name), text) if isinstance(text, str) else self.blobs.intern(text)
+                    for name, text in value.items()
+                }
+            else:
+                record[key] = self.blobs.intern(value)
+        return {**entry, "record": record}
+
+    def _write_manifest(self, trace_bytes: int, finished: bool):
+        pack_bytes, index_bytes = self.blobs.sizes() if self.blobs is not None else (0, 0)
+        manifest = {
+            "trace_bytes": trace_bytes,
+            "blob_pack_bytes": pack_bytes,
+            "blob_index_bytes": index_bytes,
+            "steps": len(self._indices),
+            "last_idx": self._last_idx,
+            "finished": finished,
+            "time": time.time(),
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+
+def read_manifest(folder: str):
+    path = os.path.join(folder, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _truncate(path: str, size: int):
+    if os.path.isfile(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+
+def recover_trace(folder: str):
+    """Cut the trace (and blob) files of a crashed game back to the last manifest.
+
+    Everything up to the last checkpoint is kept; a torn or unconfirmed tail is
+    dropped, so every remaining line is complete and its blobs exist. Without
+    a manifest only a torn last line is cut. Returns the manifest (None if absent).
+    """
+    manifest = read_manifest(folder)
+    trace_file = os.path.join(folder, TRACE_FILE)
+    if manifest is None:
+        if os.path.isfile(trace_file):
+            with open(trace_file, "rb") as f:
+                data = f.read()
+            _truncate(trace_file, data.rfind(b"\n") + 1)
+        return None
+    if not manifest["finished"]:
+        _truncate(trace_file, manifest["trace_bytes"])
+        _truncate(os.path.join(folder, PACK_FILE), manifest["blob_pack_bytes"])
+        _truncate(os.path.join(folder, INDEX_FILE), manifest["blob_index_bytes"])
+    return manifest
+
+
+def trace_path(folder: str):
+    """trace.jsonl of a game folder, or the legacy trace.json, or None."""
+    for name in (TRACE_FILE, LEGACY_TRACE_FILE):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def iter_trace_lines(path: str):
+    """Yield the parsed lines of a trace.jsonl, skipping a torn last line."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def read_trace(path: str, rehydrate: bool = True) -> dict:
+    """Load a trace in the old ``{"idx": record}`` dict shape (string keys, ascending idx).
+
+    ``path`` is a game folder, a trace.jsonl or a legacy trace.json. Blob
+    references are replaced by their text unless ``rehydrate`` is False.
+    """
+    if os.path.isdir(path):
+        path = trace_path(path)
+        if path is None:
+            return {}
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    blobs = open_blob_store(os.path.dirname(path) or ".") if rehydrate else None
+    steps = {}
+    for entry in iter_trace_lines(path):
+        if "idx" in entry:
+            record = blobs.rehydrate(entry["record"]) if blobs is not None else entry["record"]
+            steps.setdefault(int(entry["idx"]), {}).update(record)
+    if blobs is not None:
+        blobs.close()
+    return {str(idx): steps[idx] for idx in sorted(steps)}
+
+
+def trace_finished(path: str) -> bool:
+    """Whether the game of this trace ended (end marker, or game_result in a legacy trace)."""
+    if os.path.isdir(path):
+        path = trace_path(path)
+        if path is None:
+            return False
+    if path.endswith(".json"):
+        return read_game_result(path) is not None
+    return any(END_MARKER in entry for entry in iter_trace_lines(path))
+
+
+def read_game_result(path: str):
+    """The recorded game_result ("Victory", "Defeat", "Tie", ...) or None."""
+    if os.path.isdir(path):
+        path = trace_path(path)
+        if path is None:
+            return None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if '"game_result"' not in line:
+                continue
+            if path.endswith(".json"):
+                # legacy indented dump: '    "game_result": "Victory",'
+                return line.split(":", 1)[1].strip().strip(",").strip('"')
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            result = entry.get("record", entry).get("game_result")
+            if result is not None:
+                return result
+    return None
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Export a game trace (blobs rehydrated) as a legacy trace.json, or recover a crashed one.")
+    parser.add_argument("folder", help="game log folder")
+    parser.add_argument("-o", "--output", default=None, help="output file, default: <folder>/trace.json (with --recover: no export unless given)")
+    parser.add_argument("--recover", action="store_true", help="cut a crashed game's trace back to its last checkpoint")
+    args = parser.parse_args()
+
+    if args.recover:
+        manifest = recover_trace(args.folder)
+        if manifest is None:
+            print("No manifest, dropped a torn last line if any")
+        else:
+            print(f"Recovered {manifest['steps']} steps up to idx {manifest['last_idx']}")
+    if not args.recover or args.output:
+        output = args.output or os.path.join(args.folder, LEGACY_TRACE_FILE)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(read_trace(args.folder), f, indent=2, ensure_ascii=False)
+        print(f"Wrote {output}")